@@ -22,7 +22,7 @@ from sandbox.sandbox import create_sandbox, get_or_start_sandbox
 from services.llm import make_llm_api_call, list_ollama_models, download_ollama_model, select_ollama_model
 # Choose which task classifier to use
 # from services.task_classifier import get_model_for_task  # Keyword-based classifier
-from services.embedding_task_classifier import get_model_for_task  # Embedding-based classifier
+from services.embedding_task_classifier import aget_model_for_task  # Embedding-based classifier
 from services.agent_logger import log_agent_start, log_agent_stop, log_llm_request, log_tool_usage, log_file_operation
 
 # Initialize shared resources
@@ -433,7 +433,7 @@ async def start_agent(
     # If model_name is set to auto, use the task classifier to select an appropriate model
     model_name = body.model_name
     if model_name == "auto" and prompt:
-        model_name = get_model_for_task(prompt)
+        model_name = await aget_model_for_task(prompt)
         logger.info(f"Auto-selected model for task: {model_name} based on prompt analysis")
     elif model_name == "auto":
         model_name = config.MODEL_TO_USE
@@ -996,7 +996,7 @@ async def initiate_agent_with_files(
         # If model_name is set to auto, use the task classifier to select an appropriate model
         model_name = model_name
         if model_name == "auto" and prompt:
-            model_name = get_model_for_task(prompt)
+            model_name = await aget_model_for_task(prompt)
             logger.info(f"Auto-selected model for task: {model_name}")
         elif model_name == "auto":
             model_name = config.MODEL_TO_USE
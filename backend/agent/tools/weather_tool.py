@@ -6,17 +6,48 @@ import json
 import re
 import logging
 import asyncio
+from typing import Optional
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Pages larger than this are parsed in a worker thread so regex scanning
+# doesn't block the event loop
+LARGE_CONTENT_THRESHOLD = 32_000
+
+# Condition keywords looked for in page text, in priority order
+PAGE_CONDITION_KEYWORDS = (
+    "sunny", "cloudy", "partly cloudy", "overcast", "rain", "raining",
+    "snow", "snowing", "thunderstorm", "fog", "foggy", "clear"
+)
+
+# WeatherBug page patterns, compiled once
+_WB_CURRENT_TEMP_RE = re.compile(r'class="[^"]*current-temp[^"]*"[^>]*>(\d+)[°]')
+_WB_TEMP_RE = re.compile(r'(\d+)[°][FC]?')
+_WB_CONDITION_RES = [re.compile(p) for p in (
+    r'class="[^"]*current-conditions[^"]*"[^>]*>([^<]+)',
+    r'weather-condition[^>]*>([^<]+)',
+    r'weather-phrase[^>]*>([^<]+)',
+)]
+_WB_HUMIDITY_RE = re.compile(r'Humidity[^:]*:\s*(\d+)%', re.IGNORECASE)
+_WB_WIND_RE = re.compile(r'Wind[^:]*:\s*([\d\.]+\s*(?:mph|km/h|m/s))', re.IGNORECASE)
+_WB_FEELS_RE = re.compile(r'Feels Like[^0-9]*(\d+)[°]', re.IGNORECASE)
+
+# Fields read by _format_weather_response, in display order
+WEATHER_RESPONSE_FIELDS = ("temperature", "conditions", "feels_like", "humidity", "wind", "forecast")
+
 class WeatherTool(Tool):
     """Tool for retrieving accurate weather information using browser navigation and web search."""
 
+    # Shared across instances so the search client and its connections are reused
+    _web_search_tool: Optional[WebSearchTool] = None
+
     def __init__(self, project_id: str = None, thread_id: str = None, thread_manager: ThreadManager = None, sandbox_id: str = None):
         super().__init__()
-        # Initialize both tools
-        self.web_search_tool = WebSearchTool()
+        # Initialize both tools, reusing the shared web search tool if one exists
+        if WeatherTool._web_search_tool is None:
+            WeatherTool._web_search_tool = WebSearchTool()
+        self.web_search_tool = WeatherTool._web_search_tool
         
         # Only initialize browser tool if the necessary params are provided
         self.browser_tool = None
@@ -28,6 +59,12 @@ class WeatherTool(Tool):
         self.thread_manager = thread_manager
         self.sandbox_id = sandbox_id
 
+    @classmethod
+    async def aclose(cls):
+        """Close the shared web search client and release the tool so it is recreated on next use."""
+        await WebSearchTool.aclose()
+        cls._web_search_tool = None
+
     @openapi_schema({
         "type": "function",
         "function": {
@@ -278,14 +315,17 @@ class WeatherTool(Tool):
                     if content:
                         logger.info(f"Browser page content obtained from {site_name}, length: {len(content)}")
                         
-                        # Use site-specific extractor
-                        site_data = site["extractor"](content)
+                        # Use site-specific extractor, off the event loop for large pages
+                        if len(content) > LARGE_CONTENT_THRESHOLD:
+                            site_data = await asyncio.to_thread(site["extractor"], content)
+                        else:
+                            site_data = site["extractor"](content)
                         
                         # If we got valid temperature data, merge it and return
                         if site_data and site_data.get("temperature"):
                             weather_data.update(site_data)
                             weather_data["source"] = site_name
-                            logger.info(f"Successfully extracted weather data from {site_name}: {site_data}")
+                            logger.info("Weather extracted from %s: %s", site_name, site_data)
                             return weather_data
                     else:
                         logger.info(f"No content extracted from {site_name}")
@@ -348,33 +388,33 @@ class WeatherTool(Tool):
         temp_match = re.search(r'(\d+)[°]', content)
         if temp_match:
             weather_data["temperature"] = f"{temp_match.group(1)}°"
-            logger.info(f"Extracted temperature from Google: {weather_data['temperature']}")
+            logger.debug("Extracted temperature from Google: %s", weather_data["temperature"])
         
         # Extract conditions
-        for condition in ["sunny", "cloudy", "partly cloudy", "overcast", "rain", "raining",
-                        "snow", "snowing", "thunderstorm", "fog", "foggy", "clear"]:
-            if condition in content.lower():
+        content_lower = content.lower()
+        for condition in PAGE_CONDITION_KEYWORDS:
+            if condition in content_lower:
                 weather_data["conditions"] = condition
-                logger.info(f"Extracted conditions from Google: {weather_data['conditions']}")
+                logger.debug("Extracted conditions from Google: %s", weather_data["conditions"])
                 break
         
         # Extract humidity
         humidity_match = re.search(r'Humidity:\s*(\d+)%', content)
         if humidity_match:
             weather_data["humidity"] = f"{humidity_match.group(1)}%"
-            logger.info(f"Extracted humidity from Google: {weather_data['humidity']}")
+            logger.debug("Extracted humidity from Google: %s", weather_data["humidity"])
         
         # Extract wind
         wind_match = re.search(r'Wind:\s*(\d+\s*mph)', content)
         if wind_match:
             weather_data["wind"] = wind_match.group(1)
-            logger.info(f"Extracted wind from Google: {weather_data['wind']}")
+            logger.debug("Extracted wind from Google: %s", weather_data["wind"])
             
         # Extract feels like
         feels_match = re.search(r'Feels like\s*(\d+)[°]', content)
         if feels_match:
             weather_data["feels_like"] = f"{feels_match.group(1)}°"
-            logger.info(f"Extracted feels like from Google: {weather_data['feels_like']}")
+            logger.debug("Extracted feels like from Google: %s", weather_data["feels_like"])
             
         return weather_data
     
@@ -389,7 +429,7 @@ class WeatherTool(Tool):
         temp_match = re.search(r'(\d+)°[FC]?', content)
         if temp_match:
             weather_data["temperature"] = f"{temp_match.group(1)}°"
-            logger.info(f"Extracted temperature from AccuWeather: {weather_data['temperature']}")
+            logger.debug("Extracted temperature from AccuWeather: %s", weather_data["temperature"])
         
         # Extract conditions
         condition_patterns = [
@@ -400,35 +440,35 @@ class WeatherTool(Tool):
             match = re.search(pattern, content)
             if match:
                 weather_data["conditions"] = match.group(1).strip().lower()
-                logger.info(f"Extracted conditions from AccuWeather: {weather_data['conditions']}")
+                logger.debug("Extracted conditions from AccuWeather: %s", weather_data["conditions"])
                 break
                 
         # If no specific pattern matched, try common weather conditions
         if not weather_data.get("conditions"):
-            for condition in ["sunny", "cloudy", "partly cloudy", "overcast", "rain", "raining",
-                            "snow", "snowing", "thunderstorm", "fog", "foggy", "clear"]:
-                if condition in content.lower():
+            content_lower = content.lower()
+            for condition in PAGE_CONDITION_KEYWORDS:
+                if condition in content_lower:
                     weather_data["conditions"] = condition
-                    logger.info(f"Extracted conditions from AccuWeather using keywords: {weather_data['conditions']}")
+                    logger.debug("Extracted conditions from AccuWeather using keywords: %s", weather_data["conditions"])
                     break
         
         # Extract humidity
         humidity_match = re.search(r'Humidity\s*:?\s*(\d+)%', content, re.IGNORECASE)
         if humidity_match:
             weather_data["humidity"] = f"{humidity_match.group(1)}%"
-            logger.info(f"Extracted humidity from AccuWeather: {weather_data['humidity']}")
+            logger.debug("Extracted humidity from AccuWeather: %s", weather_data["humidity"])
         
         # Extract wind
         wind_matches = re.search(r'Wind\s*:?\s*([\d\.]+\s*(?:mph|km/h|m/s))', content, re.IGNORECASE)
         if wind_matches:
             weather_data["wind"] = wind_matches.group(1)
-            logger.info(f"Extracted wind from AccuWeather: {weather_data['wind']}")
+            logger.debug("Extracted wind from AccuWeather: %s", weather_data["wind"])
             
         # Extract feels like
         feels_match = re.search(r'(?:Feels Like|RealFeel)[^0-9]*(\d+)[°]', content, re.IGNORECASE)
         if feels_match:
             weather_data["feels_like"] = f"{feels_match.group(1)}°"
-            logger.info(f"Extracted feels like from AccuWeather: {weather_data['feels_like']}")
+            logger.debug("Extracted feels like from AccuWeather: %s", weather_data["feels_like"])
             
         return weather_data
     
@@ -443,7 +483,7 @@ class WeatherTool(Tool):
         temp_match = re.search(r'(\d+)°[FC]?', content)
         if temp_match:
             weather_data["temperature"] = f"{temp_match.group(1)}°"
-            logger.info(f"Extracted temperature from Weather.com: {weather_data['temperature']}")
+            logger.debug("Extracted temperature from Weather.com: %s", weather_data["temperature"])
         
         # Extract conditions
         condition_patterns = [
@@ -456,35 +496,35 @@ class WeatherTool(Tool):
             match = re.search(pattern, content)
             if match:
                 weather_data["conditions"] = match.group(1).strip().lower()
-                logger.info(f"Extracted conditions from Weather.com: {weather_data['conditions']}")
+                logger.debug("Extracted conditions from Weather.com: %s", weather_data["conditions"])
                 break
                 
         # If no specific pattern matched, try common weather conditions
         if not weather_data.get("conditions"):
-            for condition in ["sunny", "cloudy", "partly cloudy", "overcast", "rain", "raining",
-                             "snow", "snowing", "thunderstorm", "fog", "foggy", "clear"]:
-                if condition in content.lower():
+            content_lower = content.lower()
+            for condition in PAGE_CONDITION_KEYWORDS:
+                if condition in content_lower:
                     weather_data["conditions"] = condition
-                    logger.info(f"Extracted conditions from Weather.com using keywords: {weather_data['conditions']}")
+                    logger.debug("Extracted conditions from Weather.com using keywords: %s", weather_data["conditions"])
                     break
         
         # Extract humidity
         humidity_match = re.search(r'Humidity\s*:?\s*(\d+)%', content, re.IGNORECASE)
         if humidity_match:
             weather_data["humidity"] = f"{humidity_match.group(1)}%"
-            logger.info(f"Extracted humidity from Weather.com: {weather_data['humidity']}")
+            logger.debug("Extracted humidity from Weather.com: %s", weather_data["humidity"])
         
         # Extract wind
         wind_matches = re.search(r'Wind\s*:?\s*([\d\.]+\s*(?:mph|km/h|m/s))', content, re.IGNORECASE)
         if wind_matches:
             weather_data["wind"] = wind_matches.group(1)
-            logger.info(f"Extracted wind from Weather.com: {weather_data['wind']}")
+            logger.debug("Extracted wind from Weather.com: %s", weather_data["wind"])
             
         # Extract feels like
         feels_match = re.search(r'Feels Like[^0-9]*(\d+)[°]', content, re.IGNORECASE)
         if feels_match:
             weather_data["feels_like"] = f"{feels_match.group(1)}°"
-            logger.info(f"Extracted feels like from Weather.com: {weather_data['feels_like']}")
+            logger.debug("Extracted feels like from Weather.com: %s", weather_data["feels_like"])
             
         return weather_data
     
@@ -499,7 +539,7 @@ class WeatherTool(Tool):
         temp_match = re.search(r'(\d+)°[FC]?', content)
         if temp_match:
             weather_data["temperature"] = f"{temp_match.group(1)}°"
-            logger.info(f"Extracted temperature from Wunderground: {weather_data['temperature']}")
+            logger.debug("Extracted temperature from Wunderground: %s", weather_data["temperature"])
         
         # Extract conditions
         condition_patterns = [
@@ -512,35 +552,35 @@ class WeatherTool(Tool):
             match = re.search(pattern, content, re.IGNORECASE)
             if match:
                 weather_data["conditions"] = match.group(1).strip().lower()
-                logger.info(f"Extracted conditions from Wunderground: {weather_data['conditions']}")
+                logger.debug("Extracted conditions from Wunderground: %s", weather_data["conditions"])
                 break
                 
         # If no specific pattern matched, try common weather conditions
         if not weather_data.get("conditions"):
-            for condition in ["sunny", "cloudy", "partly cloudy", "overcast", "rain", "raining",
-                             "snow", "snowing", "thunderstorm", "fog", "foggy", "clear"]:
-                if condition in content.lower():
+            content_lower = content.lower()
+            for condition in PAGE_CONDITION_KEYWORDS:
+                if condition in content_lower:
                     weather_data["conditions"] = condition
-                    logger.info(f"Extracted conditions from Wunderground using keywords: {weather_data['conditions']}")
+                    logger.debug("Extracted conditions from Wunderground using keywords: %s", weather_data["conditions"])
                     break
         
         # Extract humidity
         humidity_match = re.search(r'Humidity\s*:?\s*(\d+)%', content, re.IGNORECASE)
         if humidity_match:
             weather_data["humidity"] = f"{humidity_match.group(1)}%"
-            logger.info(f"Extracted humidity from Wunderground: {weather_data['humidity']}")
+            logger.debug("Extracted humidity from Wunderground: %s", weather_data["humidity"])
         
         # Extract wind
         wind_match = re.search(r'Wind\s*:?\s*([\d\.]+\s*(?:mph|km/h|m/s))', content, re.IGNORECASE)
         if wind_match:
             weather_data["wind"] = wind_match.group(1)
-            logger.info(f"Extracted wind from Wunderground: {weather_data['wind']}")
+            logger.debug("Extracted wind from Wunderground: %s", weather_data["wind"])
             
         # Extract feels like
         feels_match = re.search(r'Feels Like[^0-9]*(\d+)[°]', content, re.IGNORECASE)
         if feels_match:
             weather_data["feels_like"] = f"{feels_match.group(1)}°"
-            logger.info(f"Extracted feels like from Wunderground: {weather_data['feels_like']}")
+            logger.debug("Extracted feels like from Wunderground: %s", weather_data["feels_like"])
             
         return weather_data
 
@@ -555,7 +595,7 @@ class WeatherTool(Tool):
         temp_match = re.search(r'(\d+\.?\d*)\s*°[FC]', content)
         if temp_match:
             weather_data["temperature"] = f"{int(float(temp_match.group(1)))}°"
-            logger.info(f"Extracted temperature from OpenWeatherMap: {weather_data['temperature']}")
+            logger.debug("Extracted temperature from OpenWeatherMap: %s", weather_data["temperature"])
         
         # Extract conditions
         condition_patterns = [
@@ -568,35 +608,35 @@ class WeatherTool(Tool):
             match = re.search(pattern, content)
             if match:
                 weather_data["conditions"] = match.group(1).strip().lower()
-                logger.info(f"Extracted conditions from OpenWeatherMap: {weather_data['conditions']}")
+                logger.debug("Extracted conditions from OpenWeatherMap: %s", weather_data["conditions"])
                 break
                 
         # If no specific pattern matched, try common weather conditions
         if not weather_data.get("conditions"):
-            for condition in ["sunny", "cloudy", "partly cloudy", "overcast", "rain", "raining",
-                            "snow", "snowing", "thunderstorm", "fog", "foggy", "clear"]:
-                if condition in content.lower():
+            content_lower = content.lower()
+            for condition in PAGE_CONDITION_KEYWORDS:
+                if condition in content_lower:
                     weather_data["conditions"] = condition
-                    logger.info(f"Extracted conditions from OpenWeatherMap using keywords: {weather_data['conditions']}")
+                    logger.debug("Extracted conditions from OpenWeatherMap using keywords: %s", weather_data["conditions"])
                     break
         
         # Extract humidity
         humidity_match = re.search(r'Humidity:\s*(\d+)%', content, re.IGNORECASE)
         if humidity_match:
             weather_data["humidity"] = f"{humidity_match.group(1)}%"
-            logger.info(f"Extracted humidity from OpenWeatherMap: {weather_data['humidity']}")
+            logger.debug("Extracted humidity from OpenWeatherMap: %s", weather_data["humidity"])
         
         # Extract wind
         wind_match = re.search(r'Wind:\s*([\d\.]+\s*(?:mph|km/h|m/s))', content, re.IGNORECASE)
         if wind_match:
             weather_data["wind"] = wind_match.group(1)
-            logger.info(f"Extracted wind from OpenWeatherMap: {weather_data['wind']}")
+            logger.debug("Extracted wind from OpenWeatherMap: %s", weather_data["wind"])
             
         # Extract feels like
         feels_match = re.search(r'Feels like[^0-9]*(\d+)[°]', content, re.IGNORECASE)
         if feels_match:
             weather_data["feels_like"] = f"{feels_match.group(1)}°"
-            logger.info(f"Extracted feels like from OpenWeatherMap: {weather_data['feels_like']}")
+            logger.debug("Extracted feels like from OpenWeatherMap: %s", weather_data["feels_like"])
             
         return weather_data
     
@@ -608,86 +648,81 @@ class WeatherTool(Tool):
             return weather_data
             
         # Extract temperature
-        temp_match = re.search(r'class="[^"]*current-temp[^"]*"[^>]*>(\d+)[°]', content)
+        temp_match = _WB_CURRENT_TEMP_RE.search(content)
         if not temp_match:
-            temp_match = re.search(r'(\d+)[°][FC]?', content)
+            temp_match = _WB_TEMP_RE.search(content)
             
         if temp_match:
             weather_data["temperature"] = f"{temp_match.group(1)}°"
-            logger.info(f"Extracted temperature from WeatherBug: {weather_data['temperature']}")
+            logger.debug("Extracted temperature from WeatherBug: %s", weather_data["temperature"])
         
         # Extract conditions
-        condition_patterns = [
-            r'class="[^"]*current-conditions[^"]*"[^>]*>([^<]+)',
-            r'weather-condition[^>]*>([^<]+)',
-            r'weather-phrase[^>]*>([^<]+)'
-        ]
-        
-        for pattern in condition_patterns:
-            match = re.search(pattern, content)
+        for pattern in _WB_CONDITION_RES:
+            match = pattern.search(content)
             if match:
                 weather_data["conditions"] = match.group(1).strip().lower()
-                logger.info(f"Extracted conditions from WeatherBug: {weather_data['conditions']}")
+                logger.debug("Extracted conditions from WeatherBug: %s", weather_data["conditions"])
                 break
                 
         # If no specific pattern matched, try common weather conditions
         if not weather_data.get("conditions"):
-            for condition in ["sunny", "cloudy", "partly cloudy", "overcast", "rain", "raining",
-                             "snow", "snowing", "thunderstorm", "fog", "foggy", "clear"]:
-                if condition in content.lower():
+            content_lower = content.lower()
+            for condition in PAGE_CONDITION_KEYWORDS:
+                if condition in content_lower:
                     weather_data["conditions"] = condition
-                    logger.info(f"Extracted conditions from WeatherBug using keywords: {weather_data['conditions']}")
+                    logger.debug("Extracted conditions from WeatherBug using keywords: %s", weather_data["conditions"])
                     break
         
         # Extract humidity
-        humidity_match = re.search(r'Humidity[^:]*:\s*(\d+)%', content, re.IGNORECASE)
+        humidity_match = _WB_HUMIDITY_RE.search(content)
         if humidity_match:
             weather_data["humidity"] = f"{humidity_match.group(1)}%"
-            logger.info(f"Extracted humidity from WeatherBug: {weather_data['humidity']}")
+            logger.debug("Extracted humidity from WeatherBug: %s", weather_data["humidity"])
         
         # Extract wind
-        wind_match = re.search(r'Wind[^:]*:\s*([\d\.]+\s*(?:mph|km/h|m/s))', content, re.IGNORECASE)
+        wind_match = _WB_WIND_RE.search(content)
         if wind_match:
             weather_data["wind"] = wind_match.group(1)
-            logger.info(f"Extracted wind from WeatherBug: {weather_data['wind']}")
+            logger.debug("Extracted wind from WeatherBug: %s", weather_data["wind"])
             
         # Extract feels like
-        feels_match = re.search(r'Feels Like[^0-9]*(\d+)[°]', content, re.IGNORECASE)
+        feels_match = _WB_FEELS_RE.search(content)
         if feels_match:
             weather_data["feels_like"] = f"{feels_match.group(1)}°"
-            logger.info(f"Extracted feels like from WeatherBug: {weather_data['feels_like']}")
+            logger.debug("Extracted feels like from WeatherBug: %s", weather_data["feels_like"])
             
         return weather_data
 
     def _format_weather_response(self, location: str, weather_data: dict, sources: list) -> str:
         """Format weather data into a human-readable response."""
+        temperature, conditions, feels_like, humidity, wind, forecast = (
+            weather_data.get(key) for key in WEATHER_RESPONSE_FIELDS
+        )
         weather_info = [f"Current weather in {location}:"]
         
         # Handle temperature and conditions
-        if weather_data.get("temperature") and weather_data.get("conditions"):
-            weather_info.append(f"Temperature: {weather_data['temperature']}, Conditions: {weather_data['conditions']}")
-        elif weather_data.get("temperature"):
-            weather_info.append(f"Temperature: {weather_data['temperature']}")
-        elif weather_data.get("conditions"):
-            weather_info.append(f"Conditions: {weather_data['conditions']}")
+        if temperature and conditions:
+            weather_info.append(f"Temperature: {temperature}, Conditions: {conditions}")
+        elif temperature:
+            weather_info.append(f"Temperature: {temperature}")
+        elif conditions:
+            weather_info.append(f"Conditions: {conditions}")
         else:
             weather_info.append("Specific temperature and conditions data isn't available.")
             
         # Add additional details if available
-        if weather_data.get("feels_like"):
-            weather_info.append(f"Feels like: {weather_data['feels_like']}")
-        if weather_data.get("humidity"):
-            weather_info.append(f"Humidity: {weather_data['humidity']}")
-        if weather_data.get("wind"):
-            weather_info.append(f"Wind: {weather_data['wind']}")
+        if feels_like:
+            weather_info.append(f"Feels like: {feels_like}")
+        if humidity:
+            weather_info.append(f"Humidity: {humidity}")
+        if wind:
+            weather_info.append(f"Wind: {wind}")
             
-        # Add forecast data if available
-        if weather_data.get("forecast"):
-            forecast_text = weather_data["forecast"]
-            # Format if needed
-            if len(forecast_text) > 100:
-                forecast_text = forecast_text[:100] + "..."
-            weather_info.append(f"Forecast: {forecast_text}")
+        # Add forecast data if available, truncated to 100 characters
+        if forecast:
+            if len(forecast) > 100:
+                forecast = forecast[:100] + "..."
+            weather_info.append(f"Forecast: {forecast}")
         
         # Add source information
         weather_info.append(f"\nData sourced from: {', '.join(sources)}")
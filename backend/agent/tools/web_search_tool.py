@@ -1,27 +1,181 @@
 from tavily import AsyncTavilyClient
 import httpx
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 import os
-from dotenv import load_dotenv
 from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
 from utils.config import config
 import json
+import orjson
 import re
 import logging
+import asyncio
+from cachetools import TTLCache
+
+try:
+    import ahocorasick
+except ImportError:
+    # Optional dependency, fall back to plain substring checks
+    ahocorasick = None
+
+try:
+    import hyperscan
+except ImportError:
+    # Optional dependency, fall back to the fused Python regex
+    hyperscan = None
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # TODO: add subpages, etc... in filters as sometimes its necessary 
 
+# Patterns used on every search call, compiled once at import
+_WEATHER_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'weather\s+in\s+(\w+)',
+    r'(\w+)\s+weather',
+    r'temperature\s+in\s+(\w+)',
+    r'how\s+is\s+the\s+weather\s+in\s+(\w+)',
+    r'forecast\s+for\s+(\w+)',
+    r'weather\s+for\s+(\w+)',
+    r'weather\s+like\s+in\s+(\w+)',
+)]
+
+_WEATHER_QUERY_WORDS_RE = re.compile(r'weather|temperature|forecast', re.IGNORECASE)
+
+_LOCATION_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'weather\s+in\s+([A-Za-z\s,]+)(?:\W|$)',
+    r'([A-Za-z\s,]+)\s+weather',
+    r'temperature\s+in\s+([A-Za-z\s,]+)(?:\W|$)',
+    r'how\s+is\s+the\s+weather\s+in\s+([A-Za-z\s,]+)(?:\W|$)',
+    r'forecast\s+for\s+([A-Za-z\s,]+)(?:\W|$)',
+    r'weather\s+for\s+([A-Za-z\s,]+)(?:\W|$)',
+    r'weather\s+like\s+in\s+([A-Za-z\s,]+)(?:\W|$)',
+)]
+
+# All snippet fields in one scan; snippets are lowercased before matching.
+# The group name is the weather_data key, and feels-like is listed before the
+# bare temperature so "feels like 72f" isn't taken as the temperature.
+_WEATHER_FIELDS_RE = re.compile(
+    r'feels like (?P<feels_like>\d+)[°]?[cf]'
+    r'|(?P<temperature>\d+)[°]?[cf]'
+    r'|humidity[:\s]+(?P<humidity>\d+)%'
+    r'|wind[:\s]+(?P<wind>\d+\s*mph)'
+)
+_WEATHER_FIELD_SUFFIXES = {"temperature": "°", "feels_like": "°", "humidity": "%", "wind": ""}
+_FORECAST_KEYWORDS = ("forecast", "expected", "will be")
+_WEATHER_RESPONSE_FIELDS = ("temperature", "conditions", "feels_like", "humidity", "wind", "forecast")
+
+# Hyperscan database with one expression per field, ids in this order
+_HS_FIELDS = ("feels_like", "temperature", "humidity", "wind")
+_FEELS_LIKE_PREFIX = "feels like ".encode()
+
+if hyperscan is not None:
+    _WEATHER_FIELDS_DB = hyperscan.Database()
+    _WEATHER_FIELDS_DB.compile(
+        expressions=[p.encode() for p in (
+            r'feels like \d+°?[cf]',
+            r'\d+°?[cf]',
+            r'humidity[:\s]+\d+%',
+            r'wind[:\s]+\d+\s*mph',
+        )],
+        ids=list(range(len(_HS_FIELDS))),
+        elements=len(_HS_FIELDS),
+        flags=[hyperscan.HS_FLAG_SOM_LEFTMOST | hyperscan.HS_FLAG_UTF8] * len(_HS_FIELDS),
+    )
+else:
+    _WEATHER_FIELDS_DB = None
+
+
+def _scan_weather_fields(text: str) -> dict:
+    """Return the first temperature, feels-like, humidity and wind values in lowercased text."""
+    found = {}
+    if _WEATHER_FIELDS_DB is None:
+        for match in _WEATHER_FIELDS_RE.finditer(text):
+            field = match.lastgroup
+            if field not in found:
+                found[field] = match.group(field) + _WEATHER_FIELD_SUFFIXES[field]
+                if len(found) == len(_WEATHER_FIELD_SUFFIXES):
+                    break
+        return found
+
+    buffer = text.encode()
+    spans = {}
+
+    def on_match(pattern_id, start, end, flags, context):
+        field = _HS_FIELDS[pattern_id]
+        if field in spans:
+            return False
+        # Digits inside "feels like 72f" belong to feels-like, not temperature
+        if field == "temperature" and buffer.endswith(_FEELS_LIKE_PREFIX, 0, start):
+            return False
+        spans[field] = (start, end)
+        # Returning True stops the scan once every field has been seen
+        return len(spans) == len(_HS_FIELDS)
+
+    try:
+        _WEATHER_FIELDS_DB.scan(buffer, match_event_handler=on_match)
+    except hyperscan.ScanTerminated:
+        pass
+
+    # Hyperscan has no capture groups, so pull the value out of each matched span
+    for field, (start, end) in spans.items():
+        match = _WEATHER_FIELDS_RE.match(buffer[start:end].decode())
+        if match and match.group(field):
+            found[field] = match.group(field) + _WEATHER_FIELD_SUFFIXES[field]
+    return found
+
+# Recent Tavily responses keyed by (query, num_results), plus the searches
+# currently in flight so concurrent identical queries share one request
+_TAVILY_CACHE = TTLCache(maxsize=512, ttl=300)
+_TAVILY_IN_FLIGHT = {}
+
+# Ordered by priority: when several appear in a snippet the earliest listed wins
+CONDITION_KEYWORDS = (
+    "sunny", "cloudy", "partly cloudy", "overcast", "rain", "raining",
+    "snow", "snowing", "thunderstorm", "fog", "foggy", "haze", "hazy",
+    "clear", "fair", "windy", "stormy", "showers", "drizzle"
+)
+
+if ahocorasick is not None:
+    _CONDITION_AUTOMATON = ahocorasick.Automaton()
+    for _priority, _keyword in enumerate(CONDITION_KEYWORDS):
+        _CONDITION_AUTOMATON.add_word(_keyword, (_priority, _keyword))
+    _CONDITION_AUTOMATON.make_automaton()
+else:
+    _CONDITION_AUTOMATON = None
+
+
+def _match_condition(snippet: str) -> Optional[str]:
+    """Return the highest-priority condition keyword found in a lowercased snippet."""
+    if _CONDITION_AUTOMATON is None:
+        for keyword in CONDITION_KEYWORDS:
+            if keyword in snippet:
+                return keyword
+        return None
+
+    # Single pass over the snippet regardless of the number of keywords
+    best = None
+    for _, match in _CONDITION_AUTOMATON.iter(snippet):
+        if best is None or match[0] < best[0]:
+            best = match
+            if best[0] == 0:
+                break
+    return best[1] if best else None
+
 class WebSearchTool(Tool):
     """Tool for performing web searches using Tavily API and web scraping using Firecrawl."""
 
+    __slots__ = ('tavily_api_key', 'firecrawl_api_key')
+
+    # Firecrawl HTTP client shared by all instances so connections are reused
+    _http_client: Optional[httpx.AsyncClient] = None
+    _http_lock = asyncio.Lock()
+
+    # Tavily clients shared by all instances, keyed by API key
+    _tavily_clients: Dict[str, AsyncTavilyClient] = {}
+
     def __init__(self, api_key: str = None):
         super().__init__()
-        # Load environment variables
-        load_dotenv()
         # Use the provided API key or get it from environment variables
         self.tavily_api_key = api_key or config.TAVILY_API_KEY
         self.firecrawl_api_key = config.FIRECRAWL_API_KEY
@@ -31,8 +185,36 @@ class WebSearchTool(Tool):
         if not self.firecrawl_api_key:
             raise ValueError("FIRECRAWL_API_KEY not found in configuration")
 
-        # Tavily asynchronous search client
-        self.tavily_client = AsyncTavilyClient(api_key=self.tavily_api_key)
+        # Tavily asynchronous search client, created once per API key
+        if self.tavily_api_key not in WebSearchTool._tavily_clients:
+            WebSearchTool._tavily_clients[self.tavily_api_key] = AsyncTavilyClient(api_key=self.tavily_api_key)
+
+    @property
+    def tavily_client(self) -> AsyncTavilyClient:
+        """Shared Tavily client for this instance's API key."""
+        return WebSearchTool._tavily_clients[self.tavily_api_key]
+
+    async def _get_http_client(self) -> httpx.AsyncClient:
+        """Get the shared Firecrawl client, creating it on first use."""
+        cls = type(self)
+        async with cls._http_lock:
+            if cls._http_client is None or cls._http_client.is_closed:
+                cls._http_client = httpx.AsyncClient(
+                    headers={
+                        "Authorization": f"Bearer {self.firecrawl_api_key}",
+                        "Content-Type": "application/json",
+                    },
+                    timeout=60,
+                    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+                )
+        return cls._http_client
+
+    @classmethod
+    async def aclose(cls):
+        """Close the shared Firecrawl client."""
+        if cls._http_client is not None:
+            await cls._http_client.aclose()
+            cls._http_client = None
 
     @openapi_schema({
         "type": "function",
@@ -125,13 +307,7 @@ class WebSearchTool(Tool):
                 num_results = 20
 
             # Execute the search with Tavily
-            search_response = await self.tavily_client.search(
-                query=query,
-                max_results=num_results,
-                include_answer=True,  # Get the answer for better results
-                include_images=False,
-                include_raw_content=True,  # Ensure we get raw content for processing
-            )
+            search_response = await self._search_tavily(query, num_results)
 
             # Normalize the response format
             raw_results = (
@@ -187,6 +363,30 @@ class WebSearchTool(Tool):
             logger.error(f"Error searching web: {e}")
             return self.fail_response(f"Error searching web: {e}")
             
+    async def _search_tavily(self, query: str, num_results: int):
+        """Run a Tavily search, reusing cached or in-flight results for the same query."""
+        key = (query, num_results)
+        cached = _TAVILY_CACHE.get(key)
+        if cached is not None:
+            return cached
+
+        task = _TAVILY_IN_FLIGHT.get(key)
+        if task is None:
+            task = asyncio.create_task(self.tavily_client.search(
+                query=query,
+                max_results=num_results,
+                include_answer=True,  # Get the answer for better results
+                include_images=False,
+                include_raw_content=True,  # Ensure we get raw content for processing
+            ))
+            _TAVILY_IN_FLIGHT[key] = task
+            task.add_done_callback(lambda _: _TAVILY_IN_FLIGHT.pop(key, None))
+
+        # Shielded so one cancelled caller doesn't cancel the search for the others
+        search_response = await asyncio.shield(task)
+        _TAVILY_CACHE[key] = search_response
+        return search_response
+
     def _process_search_results(self, results, query):
         """Process search results to extract the most relevant information.
         
@@ -211,36 +411,15 @@ class WebSearchTool(Tool):
     
     def _is_weather_query(self, query: str) -> bool:
         """Determine if a query is asking about weather."""
-        weather_patterns = [
-            r'weather\s+in\s+(\w+)',
-            r'(\w+)\s+weather',
-            r'temperature\s+in\s+(\w+)',
-            r'how\s+is\s+the\s+weather\s+in\s+(\w+)',
-            r'forecast\s+for\s+(\w+)',
-            r'weather\s+for\s+(\w+)',
-            r'weather\s+like\s+in\s+(\w+)'
-        ]
-        
-        for pattern in weather_patterns:
-            if re.search(pattern, query.lower()):
-                return True
-                
-        return False
+        # Every pattern needs one of these words, so most queries stop here
+        if not _WEATHER_QUERY_WORDS_RE.search(query):
+            return False
+        return any(p.search(query) for p in _WEATHER_PATTERNS)
     
     def _extract_location(self, query: str) -> str:
         """Extract location from a weather query."""
-        patterns = [
-            r'weather\s+in\s+([A-Za-z\s,]+)(?:\W|$)',
-            r'([A-Za-z\s,]+)\s+weather',
-            r'temperature\s+in\s+([A-Za-z\s,]+)(?:\W|$)',
-            r'how\s+is\s+the\s+weather\s+in\s+([A-Za-z\s,]+)(?:\W|$)',
-            r'forecast\s+for\s+([A-Za-z\s,]+)(?:\W|$)',
-            r'weather\s+for\s+([A-Za-z\s,]+)(?:\W|$)',
-            r'weather\s+like\s+in\s+([A-Za-z\s,]+)(?:\W|$)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
+        for pattern in _LOCATION_PATTERNS:
+            match = pattern.search(query)
             if match:
                 return match.group(1).strip()
                 
@@ -257,69 +436,49 @@ class WebSearchTool(Tool):
             "forecast": None
         }
         
-        condition_keywords = [
-            "sunny", "cloudy", "partly cloudy", "overcast", "rain", "raining",
-            "snow", "snowing", "thunderstorm", "fog", "foggy", "haze", "hazy",
-            "clear", "fair", "windy", "stormy", "showers", "drizzle"
-        ]
+        # Lowercased snippets gathered once into a flat list that every scan below reuses
+        snippets = [(result.get("snippet") or "").lower() for result in search_results]
         
-        # Process snippets to extract weather information
-        for result in search_results:
-            snippet = result.get("snippet", "").lower()
-            
-            # Temperature extraction (prioritize exact matches first)
-            if not weather_data["temperature"]:
-                temp_matches = re.findall(r'(\d+)[°]?[cf]', snippet)
-                if temp_matches:
-                    weather_data["temperature"] = f"{temp_matches[0]}°"
-                
-            # Conditions extraction
+        # Numeric fields from a single scan over all snippets, keeping the first
+        # match seen for each. No field pattern can match across the NUL separator.
+        weather_data.update(_scan_weather_fields("\x00".join(snippets)))
+        
+        # Conditions and forecast come from the first snippet that has them
+        for snippet in snippets:
             if not weather_data["conditions"]:
-                for keyword in condition_keywords:
-                    if keyword in snippet:
-                        weather_data["conditions"] = keyword
-                        break
-                    
-            # Other weather data extraction
-            if not weather_data["feels_like"]:
-                feels_like_matches = re.findall(r'feels like (\d+)[°]?[cf]', snippet)
-                if feels_like_matches:
-                    weather_data["feels_like"] = f"{feels_like_matches[0]}°"
-                    
-            if not weather_data["humidity"]:
-                humidity_matches = re.findall(r'humidity[:\s]+(\d+)%', snippet)
-                if humidity_matches:
-                    weather_data["humidity"] = f"{humidity_matches[0]}%"
+                weather_data["conditions"] = _match_condition(snippet)
                     
-            if not weather_data["wind"]:
-                wind_matches = re.findall(r'wind[:\s]+(\d+\s*mph)', snippet)
-                if wind_matches:
-                    weather_data["wind"] = wind_matches[0]
-                    
-            if not weather_data["forecast"] and ("forecast" in snippet or "expected" in snippet or "will be" in snippet):
+            if not weather_data["forecast"] and any(k in snippet for k in _FORECAST_KEYWORDS):
                 weather_data["forecast"] = snippet
+            
+            # Remaining results can't add anything once both are set
+            if weather_data["conditions"] and weather_data["forecast"]:
+                break
         
         return weather_data
     
     def _format_weather_response(self, location: str, weather_data: dict) -> str:
         """Format weather data into a human-readable response."""
+        temperature, conditions, feels_like, humidity, wind, forecast = (
+            weather_data.get(key) for key in _WEATHER_RESPONSE_FIELDS
+        )
         weather_info = [f"Current weather in {location}:"]
         
-        if weather_data["temperature"] and weather_data["conditions"]:
-            weather_info.append(f"Temperature: {weather_data['temperature']}, Conditions: {weather_data['conditions']}")
-        elif weather_data["temperature"]:
-            weather_info.append(f"Temperature: {weather_data['temperature']}")
-        elif weather_data["conditions"]:
-            weather_info.append(f"Conditions: {weather_data['conditions']}")
+        if temperature and conditions:
+            weather_info.append(f"Temperature: {temperature}, Conditions: {conditions}")
+        elif temperature:
+            weather_info.append(f"Temperature: {temperature}")
+        elif conditions:
+            weather_info.append(f"Conditions: {conditions}")
             
-        if weather_data["feels_like"]:
-            weather_info.append(f"Feels like: {weather_data['feels_like']}")
-        if weather_data["humidity"]:
-            weather_info.append(f"Humidity: {weather_data['humidity']}")
-        if weather_data["wind"]:
-            weather_info.append(f"Wind: {weather_data['wind']}")
-        if weather_data["forecast"]:
-            weather_info.append(f"Forecast: {weather_data['forecast'][:100]}...")
+        if feels_like:
+            weather_info.append(f"Feels like: {feels_like}")
+        if humidity:
+            weather_info.append(f"Humidity: {humidity}")
+        if wind:
+            weather_info.append(f"Wind: {wind}")
+        if forecast:
+            weather_info.append(f"Forecast: {forecast[:100]}...")
             
         return "\n".join(weather_info)
 
@@ -423,34 +582,31 @@ class WebSearchTool(Tool):
                 return self.fail_response("URL must be a string.")
                 
             # ---------- Firecrawl scrape endpoint ----------
-            async with httpx.AsyncClient() as client:
-                headers = {
-                    "Authorization": f"Bearer {self.firecrawl_api_key}",
-                    "Content-Type": "application/json",
-                }
-                payload = {
-                    "url": url,
-                    "formats": ["markdown"]
-                }
-                response = await client.post(
-                    "https://api.firecrawl.dev/v1/scrape",
-                    json=payload,
-                    headers=headers,
-                    timeout=60,
-                )
-                response.raise_for_status()
-                data = response.json()
+            client = await self._get_http_client()
+            # Ask only for what we return: markdown, without inlined base64 images
+            payload = {
+                "url": url,
+                "formats": ["markdown"],
+                "removeBase64Images": True
+            }
+            response = await client.post(
+                "https://api.firecrawl.dev/v1/scrape",
+                json=payload,
+            )
+            response.raise_for_status()
+            page = orjson.loads(response.content).get("data") or {}
+            metadata = page.get("metadata")
 
             # Format the response
             formatted_result = {
-                "Title": data.get("data", {}).get("metadata", {}).get("title", ""),
+                "Title": (metadata or {}).get("title", ""),
                 "URL": url,
-                "Text": data.get("data", {}).get("markdown", "")
+                "Text": page.get("markdown", "")
             }
             
             # Add metadata if available
-            if "metadata" in data.get("data", {}):
-                formatted_result["Metadata"] = data["data"]["metadata"]
+            if metadata is not None:
+                formatted_result["Metadata"] = metadata
             
             return self.success_response([formatted_result])
         
@@ -107,6 +107,9 @@ class Tool(ABC):
         success_response: Create a successful result
         fail_response: Create a failed result
     """
+
+    # Subclasses that declare their own __slots__ carry no per-instance __dict__
+    __slots__ = ('_schemas',)
     
     def __init__(self):
         """Initialize tool with empty schema registry."""
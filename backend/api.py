@@ -1,10 +1,10 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from contextlib import asynccontextmanager
-from collections import OrderedDict
 from datetime import datetime, timezone
 import asyncio
+import logging
 import uuid
 import time
 from dotenv import load_dotenv
@@ -15,8 +15,13 @@ from agentpress.thread_manager import ThreadManager
 from services.supabase import DBConnection
 from services import billing as billing_api
 from services import redis
+from services import agent_logger
+from services import model_selection_logger
+from services import embedding_task_classifier
+from services import llm
 from agent import api as agent_api
 from sandbox import api as sandbox_api
+from agent.tools.weather_tool import WeatherTool
 # Load environment variables
 load_dotenv()
 
@@ -25,15 +30,58 @@ db = DBConnection()
 thread_manager = None
 instance_id = str(uuid.uuid4())[:8]  # Generate instance ID at module load time
 
-# Rate limiter
-ip_tracker = OrderedDict()
-MAX_CONCURRENT_IPS = 25
+# Request log records, written in batches by a background task so the
+# middleware never formats or writes log lines itself
+MAX_QUEUED_REQUEST_LOGS = 10000
+REQUEST_LOG_BATCH_SIZE = 100
+_request_log_queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_QUEUED_REQUEST_LOGS)
+
+def _write_request_logs(batch):
+    """Write a batch of request records to the logger as one record."""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    logger.info("\n".join(
+        f"Request: {method} {path} from {client_ip} | Query: {query_params} | "
+        f"Status: {status_code} | Time: {process_time:.2f}s"
+        for method, path, client_ip, query_params, status_code, process_time in batch
+    ))
+
+async def _drain_request_logs():
+    """Write queued request records to the logger in batches."""
+    while True:
+        batch = [await _request_log_queue.get()]
+        while len(batch) < REQUEST_LOG_BATCH_SIZE and not _request_log_queue.empty():
+            batch.append(_request_log_queue.get_nowait())
+        _write_request_logs(batch)
+
+async def _stop_request_log_drainer(task: asyncio.Task):
+    """Stop the drainer and write any request records still queued."""
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+    batch = []
+    while True:
+        try:
+            batch.append(_request_log_queue.get_nowait())
+        except asyncio.QueueEmpty:
+            break
+        if len(batch) == REQUEST_LOG_BATCH_SIZE:
+            _write_request_logs(batch)
+            batch = []
+    if batch:
+        _write_request_logs(batch)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global thread_manager
     logger.info(f"Starting up FastAPI application with instance ID: {instance_id} in {config.ENV_MODE.value} mode")
     try:
+        # Exports provider settings such as OLLAMA_API_BASE to the environment,
+        # which the embedding classifier reads
+        llm.init_llm()
         await db.initialize()
         thread_manager = ThreadManager()
         agent_api.initialize(thread_manager, db, instance_id)
@@ -46,11 +94,48 @@ async def lifespan(app: FastAPI):
             logger.error(f"Failed to initialize Redis connection: {e}")
 
         asyncio.create_task(agent_api.restore_running_agent_runs())
+        # Compute the task embeddings after startup rather than on import
+        asyncio.create_task(embedding_task_classifier.warm_up())
+        request_log_task = asyncio.create_task(_drain_request_logs())
+        agent_logger.start_db_log_flusher()
+        model_selection_logger.start_db_log_flusher()
         yield
 
+        await _stop_request_log_drainer(request_log_task)
+
+        try:
+            logger.info("Flushing agent action logs")
+            await agent_logger.stop_db_log_flusher()
+        except Exception as e:
+            logger.error(f"Error flushing agent action logs: {e}")
+        agent_logger.stop_file_log_listener()
+
+        try:
+            logger.info("Flushing model selection logs")
+            await model_selection_logger.stop_db_log_flusher()
+        except Exception as e:
+            logger.error(f"Error flushing model selection logs: {e}")
+        model_selection_logger.stop_file_log_listener()
+
         logger.info("Cleaning up agent resources")
         await agent_api.cleanup()
 
+        try:
+            # Also closes the web search client shared with WebSearchTool
+            await WeatherTool.aclose()
+        except Exception as e:
+            logger.error(f"Error closing web search HTTP client: {e}")
+
+        try:
+            await embedding_task_classifier.aclose()
+        except Exception as e:
+            logger.error(f"Error closing embedding HTTP client: {e}")
+
+        try:
+            await llm.aclose()
+        except Exception as e:
+            logger.error(f"Error closing Ollama HTTP session: {e}")
+
         try:
             logger.info("Closing Redis connection")
             await redis.close()
@@ -69,7 +154,8 @@ app = FastAPI(
     title="AgentPress API",
     description="Backend API for the AgentPress project",
     version="0.1.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Middleware to log every request
@@ -79,14 +165,17 @@ async def log_requests_middleware(request: Request, call_next):
     client_ip = request.client.host
     method = request.method
     path = request.url.path
-    query_params = str(request.query_params)
-
-    logger.info(f"Request started: {method} {path} from {client_ip} | Query: {query_params}")
 
     try:
         response = await call_next(request)
         process_time = time.time() - start_time
-        logger.debug(f"Request completed: {method} {path} | Status: {response.status_code} | Time: {process_time:.2f}s")
+        try:
+            # Query params are only stringified if the record is written
+            _request_log_queue.put_nowait(
+                (method, path, client_ip, request.query_params, response.status_code, process_time)
+            )
+        except asyncio.QueueFull:
+            pass
         return response
     except Exception as e:
         process_time = time.time() - start_time
@@ -111,7 +200,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Include routers
+# Include routers, highest-traffic first since routes are matched in order
 app.include_router(agent_api.router, prefix="/api")
 app.include_router(sandbox_api.router, prefix="/api")
 app.include_router(billing_api.router, prefix="/api")
@@ -122,24 +211,16 @@ app.include_router(billing_api.router, prefix="/api")
 async def health():
     return {"status": "ok", "instance": instance_id}
 
-# ——— Billing: the two endpoints your UI calls
-@app.get("/api/billing/check-status")
-async def billing_check():
-    logger.info("Billing check-status called")
-    return {"billing_required": False}
-
-@app.get("/api/billing/subscription")
-async def billing_subscription():
-    logger.info("Billing subscription called")
-    # return whatever your front-end expects here
-    # for now stub it out so your UI stops  refusing connection
-    return {"subscription_active": False}
-
 # Dev mode run
 if __name__ == "__main__":
+    import sys
     import uvicorn
 
     workers = 2
+    # uvloop has no Windows support
+    loop = "asyncio" if sys.platform == "win32" else "uvloop"
+    # The reloader runs a single process and ignores workers, so only use it locally
+    reload = config.ENV_MODE == EnvMode.LOCAL
 
     logger.info(f"Starting server on 0.0.0.0:8000 with {workers} workers")
     uvicorn.run(
@@ -147,5 +228,7 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         workers=workers,
-        reload=True
+        loop=loop,
+        http="httptools",
+        reload=reload
     )
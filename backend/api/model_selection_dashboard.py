@@ -5,16 +5,93 @@ This allows monitoring how the automatic model selection is working with real us
 
 from fastapi import APIRouter, Depends, HTTPException
 import os
-import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+import orjson
+from typing import Dict, List, Any, Optional, Callable, Awaitable
 
-from services.model_selection_logger import get_selection_stats, get_selection_stats_from_db
-from services.supabase import DBConnection
+from services import redis
+from services.model_selection_logger import (
+    MODEL_SELECTION_LOG_DIR,
+    MODEL_SELECTION_LOG_FILE,
+    get_selection_stats,
+    get_selection_stats_from_db,
+)
+from services.supabase import get_client
 from utils.logger import logger
 
 router = APIRouter(prefix="/api/model-selection", tags=["model_selection"])
 
+TAIL_BLOCK_SIZE = 64 * 1024
+# Separates the timestamp from the JSON entry in selection log lines
+LOG_LINE_SEPARATOR = ' - INFO - '
+
+# Redis TTLs (seconds) for dashboard responses; the data changes slowly
+# relative to how often the dashboard refreshes
+STATS_CACHE_TTL = 60
+RECENT_CACHE_TTL = 15
+
+# Columns returned by /recent, aliased by PostgREST to the response field names
+RECENT_SELECTION_COLUMNS = (
+    "id,timestamp:created_at,prompt_preview:prompt_snippet,prompt_length,"
+    "task_type,confidence,selected_model,override_reason"
+)
+
+async def _cached(key: str, ttl: int, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Return a cached response from Redis, computing and storing it on a miss.
+    
+    Error responses are not cached, and the response is still computed if
+    Redis is unavailable.
+    
+    Args:
+        key: Redis key for the response
+        ttl: Seconds to keep the response
+        compute: Coroutine function producing the response
+        
+    Returns:
+        The cached or freshly computed response
+    """
+    try:
+        cached = await redis.get(key)
+        if cached is not None:
+            return orjson.loads(cached)
+    except Exception as e:
+        logger.warning(f"Model selection dashboard cache read failed for {key}: {e}")
+    
+    result = await compute()
+    if "error" not in result:
+        try:
+            await redis.set(key, orjson.dumps(result).decode(), ex=ttl)
+        except Exception as e:
+            logger.warning(f"Model selection dashboard cache write failed for {key}: {e}")
+    return result
+
+def _tail_lines(path: str, n: int) -> List[str]:
+    """
+    Read the last n lines of a file without reading the whole file.
+    
+    Args:
+        path: Path of the file to read
+        n: Number of lines to return
+        
+    Returns:
+        Up to n lines from the end of the file, oldest first
+    """
+    with open(path, 'rb') as f:
+        position = os.fstat(f.fileno()).st_size
+        data = b''
+        # Read fixed-size blocks backwards until we have n complete lines
+        while position > 0 and data.count(b'\n') <= n:
+            read_size = min(TAIL_BLOCK_SIZE, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+    
+    lines = data.splitlines()
+    # The first line may be cut off mid-way unless we reached the start of the file
+    if position > 0:
+        lines = lines[1:]
+    return [line.decode('utf-8', errors='replace') for line in lines[-n:]]
+
 @router.get("/stats")
 async def get_model_selection_stats(days: int = 7):
     """
@@ -23,6 +100,10 @@ async def get_model_selection_stats(days: int = 7):
     Args:
         days: Number of days to analyze
     """
+    return await _cached(f"model_selection:stats:{days}", STATS_CACHE_TTL, lambda: _compute_selection_stats(days))
+
+async def _compute_selection_stats(days: int) -> Dict[str, Any]:
+    """Build the /stats response from the database, or the log files if it has no data."""
     try:
         # Get stats from the database
         db_stats = await get_selection_stats_from_db(days)
@@ -53,14 +134,17 @@ async def get_recent_selections(limit: int = 50):
     Args:
         limit: Maximum number of entries to return
     """
+    return await _cached(f"model_selection:recent:{limit}", RECENT_CACHE_TTL, lambda: _compute_recent_selections(limit))
+
+async def _compute_recent_selections(limit: int) -> Dict[str, Any]:
+    """Build the /recent response from the database, or today's log file if it has no data."""
     try:
         # Connect to Supabase
-        db = DBConnection()
-        client = await db.client
+        client = await get_client()
         
         # Query the database for recent selections
         response = await client.table("model_selection_logs")\
-            .select("*")\
+            .select(RECENT_SELECTION_COLUMNS)\
             .order("created_at", desc=True)\
             .limit(limit)\
             .execute()
@@ -72,14 +156,12 @@ async def get_recent_selections(limit: int = 50):
             logger.info("No database records for recent selections, checking log files")
             
             # Check if log directory exists
-            log_dir = "/app/logs/model_selection"
-            if not os.path.exists(log_dir):
+            if not os.path.exists(MODEL_SELECTION_LOG_DIR):
                 return {"message": "No log data available yet", "selections": []}
             
-            # Get the most recent log file
+            # Get the current log file
             log_files = []
-            current_date = datetime.now().strftime('%Y%m%d')
-            file_path = f"{log_dir}/selection_{current_date}.log"
+            file_path = os.path.join(MODEL_SELECTION_LOG_DIR, MODEL_SELECTION_LOG_FILE)
             if os.path.exists(file_path):
                 log_files.append(file_path)
             
@@ -88,25 +170,24 @@ async def get_recent_selections(limit: int = 50):
             
             # Parse log file and get recent entries
             recent_entries = []
-            with open(log_files[0], 'r') as f:
-                for line in f:
-                    try:
-                        # Extract the JSON part of the log entry
-                        parts = line.split(' - INFO - ')
-                        if len(parts) < 2:
-                            continue
-                        
-                        json_str = parts[1].strip()
-                        entry = json.loads(json_str)
-                        
-                        # Add timestamp from log line
-                        timestamp = parts[0].strip()
-                        entry["log_timestamp"] = timestamp
-                        
-                        recent_entries.append(entry)
-                    except Exception as e:
-                        logger.error(f"Error parsing log line: {e}")
+            # Entries are appended in time order, so only the tail of the file is
+            # needed. Read twice the limit to allow for lines that fail to parse.
+            for line in _tail_lines(log_files[0], limit * 2):
+                try:
+                    # Extract the JSON part of the log entry
+                    timestamp, sep, json_str = line.partition(LOG_LINE_SEPARATOR)
+                    if not sep:
                         continue
+                    
+                    entry = orjson.loads(json_str)
+                    
+                    # Add timestamp from log line
+                    entry["log_timestamp"] = timestamp.strip()
+                    
+                    recent_entries.append(entry)
+                except Exception as e:
+                    logger.error(f"Error parsing log line: {e}")
+                    continue
             
             # Sort by timestamp (newest first) and limit
             recent_entries.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
@@ -118,23 +199,9 @@ async def get_recent_selections(limit: int = 50):
                 "selections": recent_entries
             }
         
-        # Format database results
-        selections = []
-        for log in logs:
-            selections.append({
-                "id": log.get("id"),
-                "timestamp": log.get("created_at"),
-                "prompt_preview": log.get("prompt_snippet"),
-                "prompt_length": log.get("prompt_length"),
-                "task_type": log.get("task_type"),
-                "confidence": log.get("confidence"),
-                "selected_model": log.get("selected_model"),
-                "override_reason": log.get("override_reason")
-            })
-        
         return {
             "source": "database",
-            "selections": selections
+            "selections": logs
         }
     except Exception as e:
         logger.error(f"Error getting recent model selections: {e}")
@@ -4,36 +4,54 @@ Script to check if the required tables exist in Supabase.
 """
 
 import asyncio
+from typing import List
 from dotenv import load_dotenv
-from services.supabase import DBConnection
+from services.supabase import get_client
 from utils.logger import logger
 
 # Load environment variables
 load_dotenv()
 
+REQUIRED_TABLES = ["thread_messages", "threads"]
+
+async def find_missing_tables(client, tables: List[str]) -> List[str]:
+    """
+    Return the tables from the list that don't exist.
+    
+    Uses a single get_missing_tables query when its migration has been
+    applied, otherwise probes each table, so this also works against a bare
+    database.
+    """
+    try:
+        result = await client.rpc("get_missing_tables", {"p_tables": tables}).execute()
+        return [row["table_name"] for row in result.data or []]
+    except Exception as e:
+        logger.info(f"get_missing_tables unavailable ({e}), probing tables individually")
+    
+    async def _exists(table):
+        try:
+            await client.from_(table).select("count").limit(1).execute()
+            return True
+        except Exception:
+            return False
+    
+    exists = await asyncio.gather(*(_exists(table) for table in tables))
+    return [table for table, found in zip(tables, exists) if not found]
+
 async def check_tables():
     """Check if the required tables exist in Supabase."""
     try:
         # Connect to the database
         logger.info("Connecting to Supabase...")
-        db = DBConnection()
-        client = await db.client
-        
-        # Check thread_messages table
-        logger.info("Checking thread_messages table...")
-        try:
-            result = await client.from_("thread_messages").select("count").limit(1).execute()
-            logger.info(f"thread_messages table exists: {result}")
-        except Exception as e:
-            logger.error(f"Error checking thread_messages table: {e}")
+        client = await get_client()
         
-        # Check threads table
-        logger.info("Checking threads table...")
-        try:
-            result = await client.from_("threads").select("count").limit(1).execute()
-            logger.info(f"threads table exists: {result}")
-        except Exception as e:
-            logger.error(f"Error checking threads table: {e}")
+        logger.info(f"Checking tables: {', '.join(REQUIRED_TABLES)}...")
+        missing = await find_missing_tables(client, REQUIRED_TABLES)
+        for table in REQUIRED_TABLES:
+            if table in missing:
+                logger.error(f"{table} table is missing")
+            else:
+                logger.info(f"{table} table exists")
         
         return True
     except Exception as e:
@@ -6,78 +6,77 @@ This script creates the necessary tables directly using SQL queries.
 
 import asyncio
 from dotenv import load_dotenv
-from services.supabase import DBConnection
+from services.supabase import get_client
+from check_tables import find_missing_tables
 from utils.logger import logger
 
 # Load environment variables
 load_dotenv()
 
+# Table definitions, created only if the table is missing
+TABLE_DEFINITIONS = {
+    "thread_messages": """
+    CREATE TABLE IF NOT EXISTS thread_messages (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        thread_id UUID NOT NULL,
+        content TEXT NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        role TEXT NOT NULL DEFAULT 'user',
+        metadata JSONB
+    );
+    """,
+    "threads": """
+    CREATE TABLE IF NOT EXISTS threads (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        user_id TEXT,
+        title TEXT,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        metadata JSONB
+    );
+    """
+}
+
 async def create_tables():
     """Create the necessary database tables."""
     try:
         # Connect to the database
         logger.info("Connecting to Supabase...")
-        db = DBConnection()
-        client = await db.client
+        client = await get_client()
         
-        # Create thread_messages table
-        logger.info("Creating thread_messages table...")
-        await client.from_("thread_messages").select("count").limit(1).execute()
-        logger.info("thread_messages table exists or was created successfully")
+        # Check all tables in one query
+        missing = await find_missing_tables(client, list(TABLE_DEFINITIONS))
+        if not missing:
+            logger.info("Database tables verified successfully!")
+            return True
         
-        # Create threads table
-        logger.info("Creating threads table...")
-        await client.from_("threads").select("count").limit(1).execute()
-        logger.info("threads table exists or was created successfully")
+        # Create the missing tables via direct SQL; they don't reference each
+        # other, so the statements are sent concurrently
+        async def _create(table):
+            try:
+                await client.rpc("exec_sql", {"sql": TABLE_DEFINITIONS[table]}).execute()
+                return table, None
+            except Exception as e:
+                return table, e
         
-        logger.info("Database tables verified successfully!")
-        return True
-    except Exception as e:
-        logger.error(f"Error checking/creating tables: {e}")
+        logger.info(f"Creating tables: {', '.join(missing)}...")
+        results = await asyncio.gather(*(_create(table) for table in missing))
         
-        # Try to create the tables via direct SQL if they don't exist
-        try:
-            logger.info("Attempting to create tables via direct SQL...")
-            
-            # Create thread_messages table
-            create_thread_messages = """
-            CREATE TABLE IF NOT EXISTS thread_messages (
-                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-                thread_id UUID NOT NULL,
-                content TEXT NOT NULL,
-                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-                updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-                role TEXT NOT NULL DEFAULT 'user',
-                metadata JSONB
-            );
-            """
-            
-            # Create threads table
-            create_threads = """
-            CREATE TABLE IF NOT EXISTS threads (
-                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-                user_id TEXT,
-                title TEXT,
-                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-                updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-                metadata JSONB
-            );
-            """
-            
-            # Execute SQL directly through Supabase REST API
-            logger.info("Creating thread_messages table...")
-            await client.table("thread_messages").insert({"id": "00000000-0000-0000-0000-000000000000", "thread_id": "00000000-0000-0000-0000-000000000000", "content": "Initialization record"}).execute()
-            logger.info("thread_messages table created successfully")
-            
-            logger.info("Creating threads table...")
-            await client.table("threads").insert({"id": "00000000-0000-0000-0000-000000000000", "user_id": "init", "title": "Initialization record"}).execute()
-            logger.info("threads table created successfully")
-            
+        success = True
+        for table, error in results:
+            if error is None:
+                logger.info(f"{table} table created successfully")
+            else:
+                logger.error(f"Error creating {table} table: {error}")
+                success = False
+        
+        if success:
             logger.info("Tables created successfully!")
-            return True
-        except Exception as inner_e:
-            logger.error(f"Error creating tables via direct SQL: {inner_e}")
-            return False
+        return success
+    except Exception as e:
+        logger.error(f"Error checking/creating tables: {e}")
+        return False
 
 if __name__ == "__main__":
     logger.info("Starting database table creation...")
@@ -34,11 +34,13 @@ CREATE INDEX IF NOT EXISTS threads_created_at_idx ON public.threads(created_at);
 ALTER TABLE public.thread_messages ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.threads ENABLE ROW LEVEL SECURITY;
 
--- Grant access to authenticated users
+-- Grant access to authenticated users (dropped first so the script can be re-run)
+DROP POLICY IF EXISTS thread_messages_policy ON public.thread_messages;
 CREATE POLICY thread_messages_policy ON public.thread_messages 
     USING (true)
     WITH CHECK (true);
 
+DROP POLICY IF EXISTS threads_policy ON public.threads;
 CREATE POLICY threads_policy ON public.threads 
     USING (true)
     WITH CHECK (true);
@@ -8,7 +8,7 @@ import os
 import sys
 import asyncio
 from dotenv import load_dotenv
-from services.supabase import DBConnection
+from services.supabase import get_client
 from utils.logger import logger
 
 # Load environment variables
@@ -19,8 +19,7 @@ async def init_database():
     try:
         # Connect to the database
         logger.info("Connecting to Supabase...")
-        db = DBConnection()
-        client = await db.client
+        client = await get_client()
         
         # Read the SQL file
         logger.info("Reading SQL initialization file...")
@@ -28,19 +27,10 @@ async def init_database():
         with open(sql_path, "r") as f:
             sql = f.read()
         
-        # Execute the SQL
+        # Execute the whole file in one call; the function runs it in a
+        # single transaction, so a failing statement rolls back the rest
         logger.info("Executing SQL to create tables...")
-        # Split the SQL into individual statements
-        statements = sql.split(";")
-        for statement in statements:
-            if statement.strip():
-                try:
-                    # Execute each statement
-                    await client.rpc("exec_sql", {"sql": statement}).execute()
-                    logger.info(f"Executed: {statement[:50]}...")
-                except Exception as e:
-                    logger.error(f"Error executing SQL: {e}")
-                    logger.error(f"Statement: {statement}")
+        await client.rpc("exec_sql", {"sql": sql}).execute()
         
         logger.info("Database initialization completed successfully!")
         return True
@@ -4,32 +4,313 @@ This module provides detailed logging of agent activities, LLM calls, and tool u
 """
 
 import logging
-import json
+import orjson
 import os
 import asyncio
+import atexit
+import queue
+import random
+import threading
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from cachetools import TTLCache
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Tuple, Union
 
-from services.supabase import DBConnection
+from services.supabase import get_client
 from utils.logger import logger as app_logger
 
 # Set up file logger
 agent_logger = logging.getLogger("agent_actions")
 agent_logger.setLevel(logging.INFO)
 
-# Create logs directory if it doesn't exist
-os.makedirs("/app/logs/agent_actions", exist_ok=True)
+AGENT_ACTIONS_LOG_DIR = "/app/logs/agent_actions"
 
-# Add file handler
-file_handler = logging.FileHandler(f"/app/logs/agent_actions/actions_{datetime.now().strftime('%Y%m%d')}.log")
-file_handler.setLevel(logging.INFO)
+class _UnformattedQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the listener thread."""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Messages are pre-serialized strings without args, so the record can
+        # be handed over as is
+        return record
+
+# Records go through a queue so the file is formatted and written on a
+# background thread rather than in the calling request. The file and thread
+# are only set up once something is logged.
+_file_log_queue: queue.Queue = queue.Queue(-1)
+_file_log_listener: Optional[QueueListener] = None
+_file_log_queue_handler: Optional[QueueHandler] = None
+_file_log_lock = threading.Lock()
+
+def _ensure_file_handler() -> None:
+    """Open the agent actions log file and start its writer thread, once."""
+    global _file_log_listener, _file_log_queue_handler
+    if _file_log_listener is not None:
+        return
+    with _file_log_lock:
+        if _file_log_listener is not None:
+            return
+        
+        # Create logs directory if it doesn't exist
+        os.makedirs(AGENT_ACTIONS_LOG_DIR, exist_ok=True)
+        
+        # Add file handler, rolled over to a dated backup at midnight UTC
+        file_handler = TimedRotatingFileHandler(
+            os.path.join(AGENT_ACTIONS_LOG_DIR, "actions.log"), when="midnight", utc=True, backupCount=30
+        )
+        file_handler.setLevel(logging.INFO)
+        
+        # Create formatter
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+        file_handler.setFormatter(formatter)
+        
+        listener = QueueListener(_file_log_queue, file_handler, respect_handler_level=True)
+        listener.start()
+        _file_log_queue_handler = _UnformattedQueueHandler(_file_log_queue)
+        agent_logger.addHandler(_file_log_queue_handler)
+        _file_log_listener = listener
+
+def stop_file_log_listener() -> None:
+    """Write any queued records, stop the log file thread and close the file."""
+    global _file_log_listener, _file_log_queue_handler
+    with _file_log_lock:
+        if _file_log_listener is None:
+            return
+        agent_logger.removeHandler(_file_log_queue_handler)
+        _file_log_listener.stop()
+        for handler in _file_log_listener.handlers:
+            handler.close()
+        _file_log_listener = None
+        _file_log_queue_handler = None
+
+atexit.register(stop_file_log_listener)
+
+# Pending database rows, written in batches by a background flusher so each
+# logged action doesn't cost its own round trip to Supabase
+DB_LOG_BATCH_SIZE = 200
+DB_LOG_FLUSH_INTERVAL = 0.5  # seconds
+DB_LOG_MAX_RETRIES = 3
+MAX_QUEUED_DB_LOGS = 10000
+# When a backlog builds up (e.g. after a database outage), batches grow up to
+# this size and are written through the bulk insert function instead
+DB_LOG_BULK_BATCH_SIZE = 5000
+
+_db_log_queue: Optional[asyncio.Queue] = None
+_db_log_loop: Optional[asyncio.AbstractEventLoop] = None
+_db_flusher_task: Optional[asyncio.Task] = None
+
+def _build_action_row(
+    thread_id: str,
+    action_type: str,
+    action_details: Dict[str, Any],
+    agent_run_id: Optional[str] = None,
+    project_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Build an agent_action_logs row."""
+    return {
+        "thread_id": thread_id,
+        "agent_run_id": agent_run_id,
+        "project_id": project_id,
+        "action_type": action_type,
+        "action_details": action_details
+    }
+
+async def _insert_action_rows(rows: List[Dict[str, Any]]) -> None:
+    """Insert agent_action_logs rows in a single request."""
+    client = await get_client()
+    if len(rows) > DB_LOG_BATCH_SIZE:
+        # Postgres unpacks the array and inserts every row in one statement
+        await client.rpc("bulk_insert_agent_logs", {"payload": rows}).execute()
+    else:
+        await client.table("agent_action_logs").insert(rows).execute()
+
+def _enqueue_action_row(row: Dict[str, Any]) -> bool:
+    """
+    Hand a row to the background flusher.
+    
+    Returns:
+        False if the flusher isn't running on the current event loop, in which
+        case the caller should write the row itself
+    """
+    if _db_log_queue is None:
+        return False
+    try:
+        if asyncio.get_running_loop() is not _db_log_loop:
+            return False
+    except RuntimeError:
+        return False
+    
+    try:
+        _db_log_queue.put_nowait(row)
+    except asyncio.QueueFull:
+        app_logger.error("Agent action log queue is full, dropping database log entry")
+    return True
 
-# Create formatter
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
+async def _write_batch(rows: List[Dict[str, Any]]) -> None:
+    """Write a batch of rows, retrying with exponential backoff."""
+    for attempt in range(DB_LOG_MAX_RETRIES):
+        try:
+            await _insert_action_rows(rows)
+            app_logger.debug(f"Logged {len(rows)} agent actions to database")
+            return
+        except Exception as e:
+            if attempt == DB_LOG_MAX_RETRIES - 1:
+                app_logger.error(f"Failed to log {len(rows)} agent actions to database: {e}")
+                return
+            await asyncio.sleep(2 ** attempt * DB_LOG_FLUSH_INTERVAL)
+
+def _drain_queue(rows: List[Dict[str, Any]], limit: int = DB_LOG_BATCH_SIZE) -> None:
+    """Move queued rows into the batch without waiting, up to the limit."""
+    while len(rows) < limit and not _db_log_queue.empty():
+        rows.append(_db_log_queue.get_nowait())
+
+async def _flush_action_rows() -> None:
+    """Collect queued rows and write them every DB_LOG_FLUSH_INTERVAL or DB_LOG_BATCH_SIZE rows."""
+    loop = asyncio.get_running_loop()
+    while True:
+        rows = [await _db_log_queue.get()]
+        deadline = loop.time() + DB_LOG_FLUSH_INTERVAL
+        try:
+            while len(rows) < DB_LOG_BATCH_SIZE:
+                _drain_queue(rows)
+                remaining = deadline - loop.time()
+                if len(rows) >= DB_LOG_BATCH_SIZE or remaining <= 0:
+                    break
+                try:
+                    rows.append(await asyncio.wait_for(_db_log_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Drain a backlog in bulk batches rather than many normal ones
+            if _db_log_queue.qsize() >= DB_LOG_BATCH_SIZE:
+                _drain_queue(rows, DB_LOG_BULK_BATCH_SIZE)
+        except asyncio.CancelledError:
+            # Shutting down: write what was already taken off the queue
+            await _write_batch(rows)
+            raise
+        # Shielded so a shutdown mid-write doesn't lose the batch
+        await asyncio.shield(_write_batch(rows))
 
-# Add handler to logger
-agent_logger.addHandler(file_handler)
+def start_db_log_flusher() -> None:
+    """Start the background task that batches agent action rows into the database."""
+    global _db_log_queue, _db_log_loop, _db_flusher_task
+    if _db_flusher_task is not None and not _db_flusher_task.done():
+        return
+    _db_log_queue = asyncio.Queue(maxsize=MAX_QUEUED_DB_LOGS)
+    _db_log_loop = asyncio.get_running_loop()
+    _db_flusher_task = asyncio.create_task(_flush_action_rows())
+
+async def stop_db_log_flusher() -> None:
+    """Stop the flusher and write any rows still queued."""
+    global _db_log_queue, _db_log_loop, _db_flusher_task
+    if _db_flusher_task is None:
+        return
+    _db_flusher_task.cancel()
+    try:
+        await _db_flusher_task
+    except asyncio.CancelledError:
+        pass
+    
+    pending = _db_log_queue
+    _db_log_queue = None
+    _db_log_loop = None
+    _db_flusher_task = None
+    
+    rows = []
+    while not pending.empty():
+        rows.append(pending.get_nowait())
+        if len(rows) == DB_LOG_BULK_BATCH_SIZE:
+            await _write_batch(rows)
+            rows = []
+    if rows:
+        await _write_batch(rows)
+
+# Fraction of successful actions of these types written to the database; the
+# log file still records every action. Errors are always written.
+DB_LOG_SAMPLE_RATES = {
+    "tool_usage": 0.1
+}
+# Identical tool calls in a thread within this window are written once, and the
+# number skipped is added to the next row written for that call
+DB_LOG_DEDUPE_WINDOW = 1.0  # seconds
+
+# (thread_id, tool_name, args hash) -> [last write time, skipped repeats]
+_recent_tool_calls: TTLCache = TTLCache(maxsize=10000, ttl=60)
+_recent_tool_calls_lock = threading.Lock()
+
+def _prepare_db_details(
+    thread_id: str,
+    action_type: str,
+    action_details: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """
+    Decide whether an action is written to the database.
+    
+    Args:
+        thread_id: The ID of the thread
+        action_type: Type of action
+        action_details: Details about the action
+        
+    Returns:
+        The details to store, or None if the action is skipped
+    """
+    if action_type not in DB_LOG_SAMPLE_RATES or action_details.get("error") is not None:
+        return action_details
+    
+    sample_rate = DB_LOG_SAMPLE_RATES[action_type]
+    if action_type != "tool_usage":
+        if random.random() >= sample_rate:
+            return None
+        return {**action_details, "sample_rate": sample_rate}
+    
+    args = orjson.dumps(
+        action_details.get("tool_args"),
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+        default=str
+    )
+    key = (thread_id, action_details.get("tool_name"), hash(args))
+    now = time.monotonic()
+    with _recent_tool_calls_lock:
+        entry = _recent_tool_calls.get(key)
+        if entry is not None and now - entry[0] < DB_LOG_DEDUPE_WINDOW:
+            entry[1] += 1
+            return None
+        repeat_count = entry[1] if entry is not None else 0
+        if random.random() >= sample_rate:
+            # Keep the skipped repeats for the next row that is written
+            _recent_tool_calls[key] = [now, repeat_count]
+            return None
+        _recent_tool_calls[key] = [now, 0]
+    
+    details = {**action_details, "sample_rate": sample_rate}
+    if repeat_count:
+        details["repeat_count"] = repeat_count
+    return details
+
+async def _log_action_row(row: Dict[str, Any]) -> None:
+    """Queue a row for the batch flusher when it is running on this loop, otherwise insert it."""
+    if _enqueue_action_row(row):
+        return
+    
+    try:
+        await _insert_action_rows([row])
+        app_logger.info(f"Logged agent action to database: {row['action_type']} for thread {row['thread_id']}")
+    except Exception as e:
+        app_logger.error(f"Failed to log agent action to database: {e}")
+
+# Event loop on a daemon thread for database logging from code with no running loop
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """Get the background logging loop, starting its thread on first use."""
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="agent-action-db-logger", daemon=True).start()
+            _background_loop = loop
+    return _background_loop
 
 async def log_agent_action_to_db(
     thread_id: str,
@@ -41,6 +322,10 @@ async def log_agent_action_to_db(
     """
     Log agent action to the Supabase database.
     
+    The row is queued for the batch flusher when it is running on this event
+    loop, otherwise it is inserted directly. High-volume action types are
+    sampled and deduplicated first (see DB_LOG_SAMPLE_RATES).
+    
     Args:
         thread_id: The ID of the thread
         action_type: Type of action (e.g., 'tool_call', 'llm_request', 'agent_start')
@@ -48,23 +333,10 @@ async def log_agent_action_to_db(
         agent_run_id: Optional ID of the agent run
         project_id: Optional ID of the project
     """
-    try:
-        # Connect to Supabase
-        db = DBConnection()
-        client = await db.client
-        
-        # Insert log entry
-        await client.table("agent_action_logs").insert({
-            "thread_id": thread_id,
-            "agent_run_id": agent_run_id,
-            "project_id": project_id,
-            "action_type": action_type,
-            "action_details": action_details
-        }).execute()
-        
-        app_logger.info(f"Logged agent action to database: {action_type} for thread {thread_id}")
-    except Exception as e:
-        app_logger.error(f"Failed to log agent action to database: {e}")
+    db_details = _prepare_db_details(thread_id, action_type, action_details)
+    if db_details is None:
+        return
+    await _log_action_row(_build_action_row(thread_id, action_type, db_details, agent_run_id, project_id))
 
 def log_agent_action(
     thread_id: str,
@@ -84,6 +356,7 @@ def log_agent_action(
         project_id: Optional ID of the project
     """
     # Log to file
+    _ensure_file_handler()
     log_data = {
         "timestamp": datetime.now().isoformat(),
         "thread_id": thread_id,
@@ -93,21 +366,25 @@ def log_agent_action(
         "action_details": action_details
     }
     
-    agent_logger.info(json.dumps(log_data))
+    agent_logger.info(orjson.dumps(log_data, option=orjson.OPT_NON_STR_KEYS).decode())
     
     # Also log to database asynchronously
     try:
+        db_details = _prepare_db_details(thread_id, action_type, action_details)
+        if db_details is None:
+            return
+        row = _build_action_row(thread_id, action_type, db_details, agent_run_id, project_id)
+        
         # Check if we're already in an event loop
         try:
             loop = asyncio.get_running_loop()
-            # If we're in an event loop, create a task instead of a new loop
-            asyncio.create_task(log_agent_action_to_db(thread_id, action_type, action_details, agent_run_id, project_id))
+            # If we're in an event loop, queue the row for the batch flusher,
+            # or create a task to insert it when the flusher isn't running
+            if not _enqueue_action_row(row):
+                asyncio.create_task(_log_action_row(row))
         except RuntimeError:
-            # No running event loop, create a new one
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(log_agent_action_to_db(thread_id, action_type, action_details, agent_run_id, project_id))
-            loop.close()
+            # No running event loop, hand the insert to the background loop without waiting
+            asyncio.run_coroutine_threadsafe(_log_action_row(row), _get_background_loop())
     except Exception as e:
         app_logger.error(f"Error calling async database logging: {e}")
 
@@ -132,19 +409,68 @@ def log_llm_request(
         tokens_used: Optional count of tokens used
         duration_ms: Optional duration of the request in milliseconds
     """
-    # Truncate prompt for privacy (just log first 100 chars)
-    truncated_prompt = prompt[:100] + "..." if len(prompt) > 100 else prompt
+    # Truncate prompt for privacy (just log first 100 chars). Only the snippet
+    # is kept, so a large prompt is never referenced by the log record.
+    prompt_length = len(prompt)
+    truncated_prompt = prompt if prompt_length <= 100 else prompt[:100] + "..."
     
     action_details = {
         "model_name": model_name,
         "prompt_snippet": truncated_prompt,
-        "prompt_length": len(prompt),
+        "prompt_length": prompt_length,
         "tokens_used": tokens_used,
         "duration_ms": duration_ms
     }
     
     log_agent_action(thread_id, "llm_request", action_details, agent_run_id, project_id)
 
+# Tool results are logged as at most this many characters of JSON
+TOOL_RESULT_LOG_LIMIT = 500
+
+def _truncate_for_log(value: Any, budget: int) -> Tuple[Any, int]:
+    """
+    Cut a JSON-like value down before serializing it for the log.
+    
+    Strings are sliced and containers stop taking items once the budget is
+    spent. Sizes are counted as lower bounds of the serialized length, so the
+    first `budget` characters of the JSON are the same as for the full value.
+    
+    Args:
+        value: The value to truncate
+        budget: Number of serialized characters to keep
+        
+    Returns:
+        Tuple of the truncated value and a lower bound of its serialized length
+    """
+    if isinstance(value, str):
+        value = value[:budget]
+        return value, len(value) + 2
+    if isinstance(value, dict):
+        truncated = {}
+        used = 1
+        for key, item in value.items():
+            if used >= budget:
+                break
+            used += len(str(key)) + 3 + (1 if truncated else 0)
+            truncated[key], cost = _truncate_for_log(item, budget - used)
+            used += cost
+        return truncated, used + 1
+    if isinstance(value, (list, tuple)):
+        truncated = []
+        used = 1
+        for item in value:
+            if used >= budget:
+                break
+            used += 1 if truncated else 0
+            item, cost = _truncate_for_log(item, budget - used)
+            truncated.append(item)
+            used += cost
+        return truncated, used + 1
+    if isinstance(value, float):
+        # Float formatting differs between str() and JSON, count it as one character
+        return value, 1
+    return value, len(str(value))
+
 def log_tool_usage(
     thread_id: str,
     tool_name: str,
@@ -171,13 +497,17 @@ def log_tool_usage(
     # Convert tool_result to string and truncate if needed
     if tool_result is not None:
         if isinstance(tool_result, (dict, list)):
-            tool_result_str = json.dumps(tool_result)
+            # Trim the structure first so large results are never fully serialized
+            tool_result, _ = _truncate_for_log(tool_result, TOOL_RESULT_LOG_LIMIT + 1)
+            tool_result_str = orjson.dumps(tool_result, option=orjson.OPT_NON_STR_KEYS).decode()
+        elif isinstance(tool_result, str):
+            tool_result_str = tool_result[:TOOL_RESULT_LOG_LIMIT + 1]
         else:
             tool_result_str = str(tool_result)
         
         # Truncate result if too long
-        if len(tool_result_str) > 500:
-            tool_result_str = tool_result_str[:500] + "..."
+        if len(tool_result_str) > TOOL_RESULT_LOG_LIMIT:
+            tool_result_str = tool_result_str[:TOOL_RESULT_LOG_LIMIT] + "..."
     else:
         tool_result_str = None
     
@@ -284,10 +614,18 @@ async def get_agent_action_logs(
     agent_run_id: Optional[str] = None,
     project_id: Optional[str] = None,
     action_type: Optional[str] = None,
-    days: int = 7
+    days: int = 7,
+    limit: int = 100,
+    cursor_ts: Optional[str] = None,
+    cursor_id: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
-    Get agent action logs from the database.
+    Get a page of agent action logs from the database, newest first.
+    
+    Pages are keyset-paginated: pass the created_at and id of the last log of
+    the previous page as cursor_ts and cursor_id to get the next page. At most
+    limit logs (100 by default) are returned per call, so callers that need
+    every matching log must keep paging until a short page comes back.
     
     Args:
         thread_id: Optional thread ID to filter by
@@ -295,24 +633,42 @@ async def get_agent_action_logs(
         project_id: Optional project ID to filter by
         action_type: Optional action type to filter by
         days: Number of days to look back
+        limit: Maximum number of logs to return (default 100)
+        cursor_ts: created_at of the last log of the previous page, as an ISO 8601 timestamp
+        cursor_id: id of the last log of the previous page, as a UUID
         
     Returns:
         List of agent action logs
+        
+    Raises:
+        ValueError: If cursor_ts or cursor_id is malformed
     """
+    # The cursor is interpolated into a PostgREST filter, so only accept
+    # well-formed values, re-serialized in canonical form
+    if cursor_ts:
+        cursor_ts = datetime.fromisoformat(cursor_ts).isoformat()
+    if cursor_id:
+        cursor_id = str(uuid.UUID(cursor_id))
+    
     try:
         # Connect to Supabase
-        db = DBConnection()
-        client = await db.client
+        client = await get_client()
         
         # Calculate date range
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
+        start_date = datetime.now() - timedelta(days=days)
         
         # Start building the query
         query = client.table("agent_action_logs")\
             .select("*")\
-            .gte("created_at", start_date.isoformat())\
-            .lte("created_at", end_date.isoformat())
+            .gte("created_at", start_date.isoformat())
+        
+        # Continue after the cursor, i.e. (created_at, id) < (cursor_ts, cursor_id)
+        if cursor_ts and cursor_id:
+            query = query.or_(
+                f'created_at.lt."{cursor_ts}",and(created_at.eq."{cursor_ts}",id.lt.{cursor_id})'
+            )
+        elif cursor_ts:
+            query = query.lt("created_at", cursor_ts)
         
         # Add filters if provided
         if thread_id:
@@ -324,8 +680,10 @@ async def get_agent_action_logs(
         if action_type:
             query = query.eq("action_type", action_type)
         
-        # Order by created_at
-        query = query.order("created_at", desc=True)
+        # Order by created_at, with id breaking ties so the cursor is stable
+        query = query.order("created_at", desc=True)\
+            .order("id", desc=True)\
+            .limit(limit)
         
         # Execute the query
         response = await query.execute()
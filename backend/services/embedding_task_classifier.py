@@ -3,10 +3,22 @@ Embedding-based task classifier for determining the appropriate model for a give
 """
 
 import numpy as np
+import logging
+import math
 from typing import Dict, Any, Tuple, List, Optional
 import os
+import re
 import json
+import asyncio
+import hashlib
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from cachetools import LRUCache
 from utils.logger import logger
 from utils.config import config
 
@@ -90,13 +102,128 @@ TASK_EXAMPLES = {
     ]
 }
 
-# Cache for embeddings to avoid recomputing
-EMBEDDING_CACHE = {}
+# Keywords that override the classification, each list compiled into one
+# pattern so the prompt is scanned once. Like the substring checks they
+# replace, they also match inside longer words.
+CODING_KEYWORDS = [
+    "code", "function", "programming", "debug", "algorithm", "class",
+    "method", "variable", "compile", "syntax", "api"
+]
+REASONING_KEYWORDS = [
+    "analyze", "evaluate", "compare", "contrast", "implications",
+    "reasoning", "logic", "argument", "debate", "philosophy"
+]
+CODING_RE = re.compile("|".join(map(re.escape, CODING_KEYWORDS)), re.IGNORECASE)
+REASONING_RE = re.compile("|".join(map(re.escape, REASONING_KEYWORDS)), re.IGNORECASE)
+# Confidence reported for selections decided by keywords or prompt length
+KEYWORD_CONFIDENCE = 0.99
+
+# Embedding models
+OLLAMA_EMBEDDING_MODEL = "mxbai-embed-large:latest"
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Task centroids saved by an earlier run, reused while the examples and model are unchanged
+TASK_EMBEDDINGS_FILE = "task_embeddings.npz"
+
+# Cache for embeddings to avoid recomputing, bounded so long-running servers
+# evict the least recently used entries instead of growing without limit.
+# Keyed by _prompt_key(text) so long prompts don't become long keys, with
+# embeddings stored quantized to int8 with a per-vector scale, a quarter of
+# the memory of float32; see _cache_put and _cache_get.
+EMBED_CACHE_SIZE = int(os.environ.get("EMBED_CACHE_SIZE", 10000))
+EMBEDDING_CACHE: LRUCache = LRUCache(maxsize=EMBED_CACHE_SIZE)
+# LRUCache reorders entries even on reads, so every access from
+# _cache_put/_cache_get holds this lock; embeddings are fetched from
+# worker threads as well as the caller's
+_CACHE_LOCK = threading.Lock()
+# Worker threads used to embed texts one request at a time when the batch
+# endpoints are unavailable
+EMBED_INIT_WORKERS = int(os.environ.get("EMBED_INIT_WORKERS", 8))
 TASK_EMBEDDINGS = {}
 
-def cosine_similarity(a: List[float], b: List[float]) -> float:
+# Task centroids as the L2-normalized rows of one matrix, in TASK_ORDER, so
+# scoring a prompt against every task type is a single matrix-vector product
+TASK_ORDER: List[str] = []
+TASK_MATRIX: Optional[np.ndarray] = None
+# Held while the task embeddings are computed, so concurrent first callers
+# only compute them once
+_INIT_LOCK = threading.Lock()
+
+def _normalize(vec: List[float]) -> np.ndarray:
     """
-    Calculate cosine similarity between two vectors.
+    Convert a vector to a float32 array with unit L2 norm.
+    
+    Args:
+        vec: Vector to normalize
+        
+    Returns:
+        Normalized vector (unchanged if it is all zeros)
+    """
+    vec = np.asarray(vec, dtype=np.float32)
+    # sqrt of the dot product skips np.linalg.norm's generic dispatch
+    norm = math.sqrt(float(vec @ vec))
+    if norm > 0:
+        vec = vec / norm
+    return vec
+
+# Size in bytes of the cache keys made by _prompt_key
+PROMPT_KEY_SIZE = 16
+
+def _prompt_key(prompt: str) -> bytes:
+    """Fixed-size cache key for a prompt or other text."""
+    return hashlib.blake2b(prompt.encode("utf-8", "surrogatepass"), digest_size=PROMPT_KEY_SIZE).digest()
+
+def _cache_put(text: str, embedding: np.ndarray) -> None:
+    """Store a normalized embedding in the cache, quantized to int8."""
+    scale = float(np.abs(embedding).max()) / 127 if embedding.size else 0.0
+    if scale > 0:
+        quantized = np.rint(embedding / scale).astype(np.int8)
+    else:
+        quantized = np.zeros(embedding.shape, dtype=np.int8)
+    with _CACHE_LOCK:
+        EMBEDDING_CACHE[_prompt_key(text)] = (quantized, scale)
+
+def _cache_put_fallback(text: str, embedding: np.ndarray) -> None:
+    """
+    Cache an embedding from a fallback service, unless it can't be compared
+    with the task embeddings; caching it would make every later lookup of the
+    text unusable until it was evicted.
+    """
+    if TASK_MATRIX is None or embedding.shape[0] == TASK_MATRIX.shape[1]:
+        _cache_put(text, embedding)
+
+def _cache_get(text: str) -> Optional[np.ndarray]:
+    """Get a cached embedding as a normalized float32 vector, or None if it isn't cached."""
+    with _CACHE_LOCK:
+        entry = EMBEDDING_CACHE.get(_prompt_key(text))
+    if entry is None:
+        return None
+    quantized, scale = entry
+    return _normalize(quantized * np.float32(scale))
+
+# Shared session for the synchronous Ollama calls, so connections are reused
+# instead of opening a new one per embedding
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=2, backoff_factor=0.1)
+))
+# Ollama embeds at most the model's context and drops the rest, so longer
+# texts are cut before sending to save transferring and tokenizing them.
+# Generous for mxbai-embed-large's 512-token context.
+OLLAMA_MAX_CHARS = 8192
+# Connect and read timeouts; the read timeout leaves room for Ollama to load
+# the embedding model on the first request, as the async client does
+OLLAMA_TIMEOUT = (1, 30)
+OLLAMA_BATCH_TIMEOUT = (1, 30)
+
+def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Calculate cosine similarity between two normalized vectors.
+    
+    Embeddings from get_embedding are already normalized, so this is just
+    their dot product.
     
     Args:
         a: First vector
@@ -105,39 +232,41 @@ def cosine_similarity(a: List[float], b: List[float]) -> float:
     Returns:
         Cosine similarity (between -1 and 1)
     """
-    a = np.array(a)
-    b = np.array(b)
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+    return float(np.dot(a, b))
 
-def get_embedding(text: str) -> List[float]:
+def get_embedding(text: str, use_ollama: bool = True) -> np.ndarray:
     """
     Get embedding for a text using a local model or external API.
     
     Args:
         text: Text to get embedding for
+        use_ollama: Whether to try Ollama first (False if the caller already did)
         
     Returns:
-        Embedding vector
+        Embedding vector, normalized to unit length
     """
     # Check cache first
-    if text in EMBEDDING_CACHE:
-        return EMBEDDING_CACHE[text]
+    cached = _cache_get(text)
+    if cached is not None:
+        return cached
     
     try:
         # Option 1: Use Ollama for embeddings (if available)
-        try:
-            # Use the Ollama API base from config or default to localhost
-            ollama_api_base = os.environ.get("OLLAMA_API_BASE", "http://localhost:11434")
-            response = requests.post(
-                f"{ollama_api_base}/api/embeddings",
-                json={"model": "mxbai-embed-large:latest", "prompt": text}
-            )
-            if response.status_code == 200:
-                embedding = response.json().get("embedding", [])
-                EMBEDDING_CACHE[text] = embedding
-                return embedding
-        except Exception as e:
-            logger.warning(f"Failed to get embedding from Ollama: {e}")
+        if use_ollama:
+            try:
+                # Use the Ollama API base from config or default to localhost
+                ollama_api_base = os.environ.get("OLLAMA_API_BASE", "http://localhost:11434")
+                response = _SESSION.post(
+                    f"{ollama_api_base}/api/embeddings",
+                    json={"model": OLLAMA_EMBEDDING_MODEL, "prompt": text[:OLLAMA_MAX_CHARS]},
+                    timeout=OLLAMA_TIMEOUT
+                )
+                if response.status_code == 200:
+                    embedding = _normalize(response.json().get("embedding", []))
+                    _cache_put(text, embedding)
+                    return embedding
+            except Exception as e:
+                logger.warning(f"Failed to get embedding from Ollama: {e}")
         
         # Option 2: Use OpenAI's embeddings API (if configured)
         if config.OPENAI_API_KEY:
@@ -145,55 +274,303 @@ def get_embedding(text: str) -> List[float]:
             openai.api_key = config.OPENAI_API_KEY
             
             response = openai.embeddings.create(
-                model="text-embedding-3-small",
+                model=OPENAI_EMBEDDING_MODEL,
                 input=text
             )
-            embedding = response.data[0].embedding
-            EMBEDDING_CACHE[text] = embedding
+            embedding = _normalize(response.data[0].embedding)
+            _cache_put_fallback(text, embedding)
             return embedding
             
         # Option 3: Use a simple fallback method if no embedding service is available
         # This is not ideal but better than failing completely
-        words = text.lower().split()
-        # Create a very simple embedding (word count based)
-        simple_embedding = [0.0] * 100  # 100-dimensional space
-        for i, word in enumerate(words[:100]):
-            # Hash the word to get a consistent position
-            position = hash(word) % 100
-            simple_embedding[position] += 1.0 / (i + 1)  # Weight by position
+        words = text.lower().split()[:100]
+        # Create a very simple embedding (word count based) in a 100-dimensional
+        # space: hash each word to a consistent position, weighted by its position.
+        # crc32 is used rather than hash(), which is randomized per process, so the
+        # same text gets the same embedding after a restart
+        positions = np.fromiter(
+            (zlib.crc32(word.encode("utf-8", "surrogatepass")) % 100 for word in words),
+            dtype=np.intp,
+            count=len(words)
+        )
+        weights = 1.0 / np.arange(1, len(words) + 1)
+        simple_embedding = np.bincount(positions, weights=weights, minlength=100)
             
         # Normalize
-        norm = np.linalg.norm(simple_embedding)
-        if norm > 0:
-            simple_embedding = [x / norm for x in simple_embedding]
+        simple_embedding = _normalize(simple_embedding)
             
-        EMBEDDING_CACHE[text] = simple_embedding
+        _cache_put_fallback(text, simple_embedding)
         return simple_embedding
             
     except Exception as e:
         logger.error(f"Error getting embedding: {e}")
         # Return a zero vector as fallback
-        return [0.0] * 100
+        return np.zeros(100, dtype=np.float32)
 
-def initialize_task_embeddings():
+# Maximum number of embedding requests in flight from the async path, so
+# concurrent classifications don't flood the embedding server
+EMBED_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", 4))
+
+# Shared async HTTP client and concurrency limit, created on first use
+_async_client: Optional[httpx.AsyncClient] = None
+_embed_semaphore: Optional[asyncio.Semaphore] = None
+
+async def aget_embedding(text: str) -> np.ndarray:
     """
-    Initialize task embeddings by averaging example embeddings.
+    Get embedding for a text without blocking the event loop.
+    
+    Ollama is called through a shared async client, with at most
+    EMBED_CONCURRENCY requests in flight. If that fails, the synchronous
+    fallbacks of get_embedding run in a worker thread.
+    
+    Args:
+        text: Text to get embedding for
+        
+    Returns:
+        Embedding vector, normalized to unit length
+    """
+    global _async_client, _embed_semaphore
+    
+    # Check cache first
+    cached = _cache_get(text)
+    if cached is not None:
+        return cached
+    
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(timeout=30.0)
+    if _embed_semaphore is None:
+        _embed_semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+    
+    try:
+        ollama_api_base = os.environ.get("OLLAMA_API_BASE", "http://localhost:11434")
+        async with _embed_semaphore:
+            response = await _async_client.post(
+                f"{ollama_api_base}/api/embeddings",
+                json={"model": OLLAMA_EMBEDDING_MODEL, "prompt": text[:OLLAMA_MAX_CHARS]}
+            )
+        if response.status_code == 200:
+            embedding = _normalize(response.json().get("embedding", []))
+            _cache_put(text, embedding)
+            return embedding
+    except Exception as e:
+        logger.warning(f"Failed to get embedding from Ollama: {e}")
+    
+    return await asyncio.to_thread(get_embedding, text, False)
+
+async def aclose() -> None:
+    """Close the shared async HTTP client."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+def _fetch_embeddings(texts: List[str]) -> Optional[str]:
+    """
+    Embed texts with a single Ollama or OpenAI request and cache the results.
+    
+    Ollama's /api/embed and OpenAI's embeddings API both accept a list of inputs.
+    
+    Args:
+        texts: Texts to embed
+        
+    Returns:
+        Name of the model that embedded the texts, or None if neither service did
+    """
+    # Option 1: Use Ollama's batch endpoint (if available)
+    try:
+        ollama_api_base = os.environ.get("OLLAMA_API_BASE", "http://localhost:11434")
+        response = _SESSION.post(
+            f"{ollama_api_base}/api/embed",
+            json={"model": OLLAMA_EMBEDDING_MODEL, "input": [text[:OLLAMA_MAX_CHARS] for text in texts]},
+            timeout=OLLAMA_BATCH_TIMEOUT
+        )
+        if response.status_code == 200:
+            embeddings = response.json().get("embeddings", [])
+            if len(embeddings) == len(texts):
+                for text, embedding in zip(texts, embeddings):
+                    _cache_put(text, _normalize(embedding))
+                return OLLAMA_EMBEDDING_MODEL
+    except Exception as e:
+        logger.warning(f"Failed to get batch embeddings from Ollama: {e}")
+    
+    # Option 2: Use OpenAI's embeddings API (if configured)
+    if config.OPENAI_API_KEY:
+        try:
+            import openai
+            openai.api_key = config.OPENAI_API_KEY
+            
+            response = openai.embeddings.create(
+                model=OPENAI_EMBEDDING_MODEL,
+                input=texts
+            )
+            for item in response.data:
+                _cache_put_fallback(texts[item.index], _normalize(item.embedding))
+            return OPENAI_EMBEDDING_MODEL
+        except Exception as e:
+            logger.warning(f"Failed to get batch embeddings from OpenAI: {e}")
+    
+    return None
+
+def get_embeddings_batch(texts: List[str]) -> List[np.ndarray]:
+    """
+    Get embeddings for several texts, requesting the uncached ones in one call.
+    
+    Texts that neither Ollama nor OpenAI embeds go through get_embedding.
+    
+    Args:
+        texts: Texts to get embeddings for
+        
+    Returns:
+        Embedding vectors in the same order as the texts, normalized to unit length
+    """
+    missing = list(dict.fromkeys(text for text in texts if _prompt_key(text) not in EMBEDDING_CACHE))
+    if missing:
+        _fetch_embeddings(missing)
+    
+    return _embed_each(texts)
+
+def _embed_each(texts: List[str]) -> List[np.ndarray]:
+    """
+    Get embeddings for texts through get_embedding and its fallbacks.
+    
+    Texts the batch request left uncached are embedded concurrently, since
+    each one is a separate network request.
+    
+    Args:
+        texts: Texts to get embeddings for
+        
+    Returns:
+        Embedding vectors in the same order as the texts
+    """
+    uncached = sum(_prompt_key(text) not in EMBEDDING_CACHE for text in set(texts))
+    if uncached <= 1:
+        return [get_embedding(text) for text in texts]
+    
+    with ThreadPoolExecutor(max_workers=min(EMBED_INIT_WORKERS, uncached)) as executor:
+        return list(executor.map(get_embedding, texts))
+
+def _task_embeddings_key(model: str) -> str:
+    """Hash identifying task embeddings computed with this model from the current examples."""
+    payload = json.dumps([model, TASK_EXAMPLES], sort_keys=True).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+def _set_task_matrix() -> None:
+    """
+    Stack the task embeddings into TASK_MATRIX, normalizing each row once.
+    
+    The matrix is kept C-contiguous float32, the same dtype as the prompt
+    embeddings, so scoring is a single float32 BLAS call with no casts.
+    """
+    global TASK_ORDER, TASK_MATRIX
+    
+    task_matrix = np.ascontiguousarray(list(TASK_EMBEDDINGS.values()), dtype=np.float32)
+    norms = np.sqrt(np.einsum("ij,ij->i", task_matrix, task_matrix))[:, np.newaxis]
+    norms[norms == 0] = 1.0
+    task_matrix /= norms
+    TASK_ORDER = list(TASK_EMBEDDINGS)
+    TASK_MATRIX = task_matrix
+
+def _load_task_embeddings(file_path: str = TASK_EMBEDDINGS_FILE) -> bool:
+    """
+    Load task embeddings saved by an earlier run, if they match the current examples.
+    
+    Args:
+        file_path: Path to load the task embeddings from
+        
+    Returns:
+        True if the task embeddings were loaded
     """
     global TASK_EMBEDDINGS
     
+    try:
+        if not os.path.exists(file_path):
+            return False
+        with np.load(file_path) as data:
+            # Only centroids from the Ollama model match the prompt embeddings;
+            # OpenAI's have a different dimension
+            if str(data["key"]) != _task_embeddings_key(OLLAMA_EMBEDDING_MODEL):
+                logger.info(f"Task embeddings in {file_path} are out of date, recomputing")
+                return False
+            TASK_EMBEDDINGS = dict(zip(data["task_order"].tolist(), data["centroids"].tolist()))
+        _set_task_matrix()
+        logger.info(f"Loaded task embeddings from {file_path}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to load task embeddings: {e}")
+        return False
+
+def _save_task_embeddings(model: str, file_path: str = TASK_EMBEDDINGS_FILE) -> None:
+    """
+    Save the task embeddings, keyed by the model and examples they were computed from.
+    
+    Args:
+        model: Name of the model that embedded the examples
+        file_path: Path to save the task embeddings to
+    """
+    try:
+        np.savez_compressed(
+            file_path,
+            key=np.array(_task_embeddings_key(model)),
+            task_order=np.array(list(TASK_EMBEDDINGS)),
+            centroids=np.asarray(list(TASK_EMBEDDINGS.values()), dtype=np.float32)
+        )
+        logger.info(f"Saved task embeddings to {file_path}")
+    except Exception as e:
+        logger.error(f"Failed to save task embeddings: {e}")
+
+def initialize_task_embeddings():
+    """
+    Initialize task embeddings by averaging example embeddings.
+    
+    The result is saved to TASK_EMBEDDINGS_FILE and reused by later runs as
+    long as the examples and embedding model are unchanged. Safe to call from
+    several threads; only the first call does any work.
+    """
     # Skip if already initialized
-    if TASK_EMBEDDINGS:
+    if TASK_MATRIX is not None:
         return
-        
+    
+    with _INIT_LOCK:
+        # Another thread may have finished while this one waited for the lock
+        if TASK_MATRIX is None:
+            _initialize_task_embeddings()
+
+def _initialize_task_embeddings() -> None:
+    """Load or compute the task embeddings; called with _INIT_LOCK held."""
+    if _load_task_embeddings():
+        return
+    
+    # Get embeddings for all examples of every task type in one batch
+    texts = [example for examples in TASK_EXAMPLES.values() for example in examples]
+    missing = list(dict.fromkeys(text for text in texts if _prompt_key(text) not in EMBEDDING_CACHE))
+    model = _fetch_embeddings(missing) if missing else None
+    all_embeddings = _embed_each(texts)
+    
+    start = 0
     for task_type, examples in TASK_EXAMPLES.items():
-        # Get embeddings for all examples
-        embeddings = [get_embedding(example) for example in examples]
+        embeddings = all_embeddings[start:start + len(examples)]
+        start += len(examples)
         
         # Average the embeddings
         if embeddings:
             avg_embedding = np.mean(embeddings, axis=0).tolist()
             TASK_EMBEDDINGS[task_type] = avg_embedding
             logger.info(f"Initialized embedding for task type: {task_type}")
+    
+    _set_task_matrix()
+    
+    # Only save embeddings from the model prompts are normally embedded with;
+    # fallback embeddings would be reloaded by later runs even once Ollama is
+    # reachable again, and wouldn't match its embedding size
+    if model == OLLAMA_EMBEDDING_MODEL:
+        _save_task_embeddings(model)
+
+async def warm_up() -> None:
+    """Initialize the task embeddings in a worker thread, e.g. at application startup."""
+    try:
+        await asyncio.to_thread(initialize_task_embeddings)
+    except Exception as e:
+        logger.error(f"Failed to initialize task embeddings: {e}")
 
 def classify_task_with_embeddings(prompt: str) -> Tuple[str, float]:
     """
@@ -206,22 +583,105 @@ def classify_task_with_embeddings(prompt: str) -> Tuple[str, float]:
         A tuple of (task_type, confidence)
     """
     # Initialize task embeddings if not already done
-    if not TASK_EMBEDDINGS:
+    if TASK_MATRIX is None:
         initialize_task_embeddings()
     
-    # Get embedding for the prompt
-    prompt_embedding = get_embedding(prompt)
+    # Get the (normalized) embedding for the prompt
+    return _classify_embedding(get_embedding(prompt))
+
+async def aclassify_task_with_embeddings(prompt: str) -> Tuple[str, float]:
+    """
+    Classify a task based on the prompt using embeddings, without blocking the event loop.
     
-    # Calculate similarity with each task type
-    similarities = {}
-    for task_type, task_embedding in TASK_EMBEDDINGS.items():
-        similarity = cosine_similarity(prompt_embedding, task_embedding)
-        similarities[task_type] = similarity
+    Args:
+        prompt: The user's prompt
+        
+    Returns:
+        A tuple of (task_type, confidence)
+    """
+    # Initialize task embeddings if not already done
+    if TASK_MATRIX is None:
+        await asyncio.to_thread(initialize_task_embeddings)
+    
+    return _classify_embedding(await aget_embedding(prompt))
+
+def classify_tasks_with_embeddings(prompts: List[str]) -> List[Tuple[str, float]]:
+    """
+    Classify several tasks at once, e.g. when backfilling or evaluating offline.
+    
+    The uncached prompts are embedded in one request and scored against every
+    task type with a single matrix product.
+    
+    Args:
+        prompts: The prompts to classify
+        
+    Returns:
+        A (task_type, confidence) tuple for each prompt, in order
+    """
+    if not prompts:
+        return []
     
-    logger.debug(f"Task similarities: {similarities}")
+    # Initialize task embeddings if not already done
+    initialize_task_embeddings()
+    
+    embeddings = get_embeddings_batch(prompts)
+    # Fallback embeddings may not match the task embeddings' size; those
+    # prompts go through _classify_embedding, which handles the mismatch
+    if any(embedding.shape[0] != TASK_MATRIX.shape[1] for embedding in embeddings):
+        return [_classify_embedding(embedding) for embedding in embeddings]
+    
+    prompt_matrix = np.stack(embeddings)
+    similarities = prompt_matrix @ TASK_MATRIX.T
+    return [_classify_similarities(row) for row in similarities.tolist()]
+
+# Returned by _classify_embedding when the prompt embedding can't be compared
+# with the task embeddings. Callers check for this exact object, so a
+# classification that only degraded because an embedding service was
+# unavailable isn't cached.
+MISMATCHED_EMBEDDING_RESULT: Tuple[str, float] = ("general", 0.5)
+
+def _classify_embedding(prompt_vec: np.ndarray) -> Tuple[str, float]:
+    """
+    Classify a task from the normalized embedding of its prompt.
+    
+    Args:
+        prompt_vec: Normalized prompt embedding
+        
+    Returns:
+        A tuple of (task_type, confidence)
+    """
+    # Calculate cosine similarity with every task type at once; asarray is a
+    # no-op for the float32 embeddings get_embedding returns
+    prompt_vec = np.asarray(prompt_vec, dtype=np.float32)
+    
+    # A prompt embedded by a fallback service can't be compared with the task
+    # embeddings, so treat it as a general task rather than failing
+    if prompt_vec.shape[0] != TASK_MATRIX.shape[1]:
+        logger.warning(
+            f"Prompt embedding size {prompt_vec.shape[0]} doesn't match task embedding "
+            f"size {TASK_MATRIX.shape[1]}, defaulting to general"
+        )
+        return MISMATCHED_EMBEDDING_RESULT
+    
+    return _classify_similarities((TASK_MATRIX @ prompt_vec).tolist())
+
+def _classify_similarities(similarities: List[float]) -> Tuple[str, float]:
+    """
+    Classify a task from its prompt's similarity to each task type.
+    
+    Args:
+        similarities: Cosine similarities, in TASK_ORDER
+        
+    Returns:
+        A tuple of (task_type, confidence)
+    """
+    # With only a handful of task types the ranking is cheaper in plain
+    # Python than through further NumPy calls
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Task similarities: {dict(zip(TASK_ORDER, similarities))}")
     
     # Sort task types by similarity
-    sorted_similarities = sorted(similarities.items(), key=lambda x: x[1], reverse=True)
+    sorted_similarities = sorted(zip(TASK_ORDER, similarities), key=lambda item: item[1], reverse=True)
     best_task_type, max_similarity = sorted_similarities[0]
     
     # Define confidence thresholds for different task types
@@ -258,6 +718,11 @@ def classify_task_with_embeddings(prompt: str) -> Tuple[str, float]:
     logger.info(f"Classified task as {best_task_type} with confidence {confidence:.2f}")
     return best_task_type, confidence
 
+# Recent model selections, keyed by a hash of the prompt so repeated prompts
+# (retries, re-evaluations) skip classification: (task_type, confidence, model, override_reason)
+SELECTION_CACHE_SIZE = 2048
+_SELECTION_CACHE: LRUCache = LRUCache(maxsize=SELECTION_CACHE_SIZE)
+
 def get_model_for_task(prompt: str) -> str:
     """
     Get the appropriate model for a given task using embedding-based classification.
@@ -268,46 +733,157 @@ def get_model_for_task(prompt: str) -> str:
     Returns:
         The name of the model to use
     """
-    # Import the logger here to avoid circular imports
-    try:
-        from services.model_selection_logger import log_model_selection
-    except ImportError:
-        # If the logger module isn't available, create a dummy function
-        def log_model_selection(*args, **kwargs):
-            pass
+    key = _prompt_key(prompt)
+    selection = _SELECTION_CACHE.get(key)
+    if selection is None:
+        signals = _keyword_signals(prompt)
+        selection = _keyword_selection(*signals)
+        if selection is None:
+            classification = classify_task_with_embeddings(prompt)
+            selection = _classified_selection(*classification, *signals)
+            # Don't keep a fallback classification once the embedding service recovers
+            if classification is not MISMATCHED_EMBEDDING_RESULT:
+                _SELECTION_CACHE[key] = selection
+        else:
+            _SELECTION_CACHE[key] = selection
+    return _log_selection(prompt, *selection)
+
+async def aget_model_for_task(prompt: str) -> str:
+    """
+    Get the appropriate model for a given task without blocking the event loop.
     
-    task_type, confidence = classify_task_with_embeddings(prompt)
+    Args:
+        prompt: The user's prompt
+        
+    Returns:
+        The name of the model to use
+    """
+    key = _prompt_key(prompt)
+    selection = _SELECTION_CACHE.get(key)
+    if selection is None:
+        signals = _keyword_signals(prompt)
+        selection = _keyword_selection(*signals)
+        if selection is None:
+            classification = await aclassify_task_with_embeddings(prompt)
+            selection = _classified_selection(*classification, *signals)
+            # Don't keep a fallback classification once the embedding service recovers
+            if classification is not MISMATCHED_EMBEDDING_RESULT:
+                _SELECTION_CACHE[key] = selection
+        else:
+            _SELECTION_CACHE[key] = selection
+    return _log_selection(prompt, *selection)
+
+def _keyword_signals(prompt: str) -> Tuple[bool, bool, bool]:
+    """
+    Scan a prompt for the signals that can override its classification.
     
-    # Get the model for the task type
-    model = TASK_MODELS.get(task_type, TASK_MODELS["general"])
-    override_reason = None
+    Args:
+        prompt: The user's prompt
+        
+    Returns:
+        A tuple of (has_coding_keywords, is_long, has_reasoning_terms)
+    """
+    return (
+        CODING_RE.search(prompt) is not None,
+        len(prompt.split()) > 100,
+        REASONING_RE.search(prompt) is not None
+    )
+
+def _keyword_selection(has_coding: bool, is_long: bool, has_reasoning: bool) -> Optional[Tuple[str, float, str, str]]:
+    """
+    Select a model from strong signals in the prompt, without embedding it.
+    
+    Only signals that pick the same model whatever the embedding classifier
+    would say are decided here: coding keywords alone select the coding
+    model, and a long prompt or reasoning terms without coding keywords
+    select the reasoning model. A prompt with both depends on whether it is
+    classified as coding, so it still needs classifying.
+    
+    Args:
+        has_coding: Whether the prompt contains coding keywords
+        is_long: Whether the prompt is over 100 words
+        has_reasoning: Whether the prompt contains reasoning terms
+        
+    Returns:
+        A tuple of (task_type, confidence, model, override_reason), or None if
+        the prompt needs classifying
+    """
+    if has_coding:
+        if is_long or has_reasoning:
+            return None
+        logger.info(f"Selecting coding model based on keywords")
+        return "coding", KEYWORD_CONFIDENCE, TASK_MODELS["coding"], "coding_keywords_detected"
     
-    # For complex prompts that might involve multiple task types,
-    # we can make more nuanced decisions
-    prompt_lower = prompt.lower()
+    # For very long or complex prompts, prefer more powerful models
+    if is_long:
+        logger.info(f"Long complex prompt detected, using reasoning model")
+        return "reasoning", KEYWORD_CONFIDENCE, TASK_MODELS["reasoning"], "long_complex_prompt"
     
+    # For prompts that explicitly mention reasoning or analysis
+    if has_reasoning:
+        logger.info(f"Reasoning terms detected, using reasoning model")
+        return "reasoning", KEYWORD_CONFIDENCE, TASK_MODELS["reasoning"], "reasoning_terms_detected"
+    
+    return None
+
+def _classified_selection(
+    task_type: str,
+    confidence: float,
+    has_coding: bool,
+    is_long: bool,
+    has_reasoning: bool
+) -> Tuple[str, float, str, Optional[str]]:
+    """
+    Select a model for a classified prompt, applying the keyword overrides.
+    
+    Args:
+        task_type: The classified task type
+        confidence: The classification confidence
+        has_coding: Whether the prompt contains coding keywords
+        is_long: Whether the prompt is over 100 words
+        has_reasoning: Whether the prompt contains reasoning terms
+        
+    Returns:
+        A tuple of (task_type, confidence, model, override_reason)
+    """
     # Check for specific indicators that might override the classification
-    if task_type != "coding" and any(term in prompt_lower for term in [
-        "code", "function", "programming", "debug", "algorithm", "class", 
-        "method", "variable", "compile", "syntax", "api"]):
-        # This looks like it might involve coding despite classification
-        override_reason = "coding_keywords_detected"
+    if task_type != "coding" and has_coding:
         logger.info(f"Overriding classification to coding based on keywords")
-        model = TASK_MODELS["coding"]
+        return task_type, confidence, TASK_MODELS["coding"], "coding_keywords_detected"
     
     # For very long or complex prompts, prefer more powerful models
-    elif len(prompt.split()) > 100 and task_type != "reasoning":
-        override_reason = "long_complex_prompt"
+    if task_type != "reasoning" and is_long:
         logger.info(f"Long complex prompt detected, using reasoning model")
-        model = TASK_MODELS["reasoning"]
+        return task_type, confidence, TASK_MODELS["reasoning"], "long_complex_prompt"
     
     # For prompts that explicitly mention reasoning or analysis
-    elif task_type != "reasoning" and any(term in prompt_lower for term in [
-        "analyze", "evaluate", "compare", "contrast", "implications", 
-        "reasoning", "logic", "argument", "debate", "philosophy"]):
-        override_reason = "reasoning_terms_detected"
+    if task_type != "reasoning" and has_reasoning:
         logger.info(f"Reasoning terms detected, using reasoning model")
-        model = TASK_MODELS["reasoning"]
+        return task_type, confidence, TASK_MODELS["reasoning"], "reasoning_terms_detected"
+    
+    return task_type, confidence, TASK_MODELS.get(task_type, TASK_MODELS["general"]), None
+
+def _log_selection(prompt: str, task_type: str, confidence: float, model: str, override_reason: Optional[str]) -> str:
+    """
+    Log a model selection for analysis, including ones served from the cache.
+    
+    Args:
+        prompt: The user's prompt
+        task_type: The classified task type
+        confidence: The classification confidence
+        model: The selected model
+        override_reason: Reason for overriding the classification (if applicable)
+        
+    Returns:
+        The selected model
+    """
+    # Import the logger here to avoid circular imports
+    try:
+        from services.model_selection_logger import log_model_selection
+    except ImportError:
+        # If the logger module isn't available, create a dummy function
+        def log_model_selection(*args, **kwargs):
+            pass
     
     logger.info(f"Selected model {model} for task type {task_type}")
     
@@ -322,33 +898,53 @@ def get_model_for_task(prompt: str) -> str:
     
     return model
 
-def save_embeddings_cache(file_path: str = "embedding_cache.json"):
+def save_embeddings_cache(file_path: str = "embedding_cache.npz"):
     """
-    Save the embedding cache to a file.
+    Save the embedding cache to a binary NumPy file.
+    
+    The cache keys are stored as one array of fixed-size text hashes and the
+    quantized embeddings as one int8 array with per-entry lengths, since
+    embedding sizes differ between models, alongside the per-embedding scales.
     
     Args:
         file_path: Path to save the cache to
     """
     try:
-        with open(file_path, "w") as f:
-            json.dump(EMBEDDING_CACHE, f)
+        entries = list(EMBEDDING_CACHE.items())
+        vectors = [quantized for _, (quantized, _) in entries]
+        np.savez(
+            file_path,
+            keys=np.frombuffer(b"".join(key for key, _ in entries), dtype=np.uint8).reshape(-1, PROMPT_KEY_SIZE),
+            vectors=np.concatenate(vectors) if vectors else np.empty(0, dtype=np.int8),
+            vector_lengths=np.array([len(vector) for vector in vectors], dtype=np.int64),
+            scales=np.array([scale for _, (_, scale) in entries], dtype=np.float32)
+        )
         logger.info(f"Saved embedding cache to {file_path}")
     except Exception as e:
         logger.error(f"Failed to save embedding cache: {e}")
 
-def load_embeddings_cache(file_path: str = "embedding_cache.json"):
+def load_embeddings_cache(file_path: str = "embedding_cache.npz"):
     """
-    Load the embedding cache from a file.
+    Load the embedding cache from a file written by save_embeddings_cache.
+    
+    The cached embeddings are views into one array read from the file.
     
     Args:
         file_path: Path to load the cache from
     """
-    global EMBEDDING_CACHE
-    
     try:
         if os.path.exists(file_path):
-            with open(file_path, "r") as f:
-                EMBEDDING_CACHE = json.load(f)
+            with np.load(file_path) as data:
+                keys = [key.tobytes() for key in data["keys"]]
+                vectors = data["vectors"]
+                vector_ends = np.cumsum(data["vector_lengths"]).tolist()
+                scales = data["scales"].tolist()
+            
+            EMBEDDING_CACHE.clear()
+            vector_start = 0
+            for key, vector_end, scale in zip(keys, vector_ends, scales):
+                EMBEDDING_CACHE[key] = (vectors[vector_start:vector_end], scale)
+                vector_start = vector_end
             logger.info(f"Loaded embedding cache from {file_path} with {len(EMBEDDING_CACHE)} entries")
     except Exception as e:
         logger.error(f"Failed to load embedding cache: {e}")
@@ -368,9 +964,3 @@ def get_available_task_models() -> List[Dict[str, Any]]:
         }
         for task_type, model_name in TASK_MODELS.items()
     ]
-
-# Initialize embeddings when module is loaded
-try:
-    initialize_task_embeddings()
-except Exception as e:
-    logger.error(f"Failed to initialize task embeddings: {e}")
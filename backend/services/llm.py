@@ -10,16 +10,33 @@ This module provides a unified interface for making API calls to different LLM p
 - Comprehensive error handling and logging
 """
 
-from typing import Union, Dict, Any, Optional, AsyncGenerator, List
+from typing import Union, Dict, Any, Optional, AsyncGenerator, List, Tuple, Mapping
+from types import MappingProxyType
+from dataclasses import dataclass, field
+from functools import lru_cache
 import os
+import re
 import json
+import copy
 import asyncio
+import hashlib
+import orjson
+import httpx
+from cachetools import TTLCache
 from openai import OpenAIError
 import litellm
+
+try:
+    import h2
+except ImportError:
+    # Optional dependency, Ollama requests fall back to HTTP/1.1
+    h2 = None
+
 from utils.logger import logger
 from utils.config import config
 from datetime import datetime
 import traceback
+import time
 
 # litellm.set_verbose=True
 litellm.modify_params=True
@@ -29,6 +46,11 @@ MAX_RETRIES = 3
 RATE_LIMIT_DELAY = 30
 RETRY_DELAY = 5
 
+# Responses to deterministic calls (temperature 0, no streaming, no tools),
+# reused for config.LLM_RESPONSE_CACHE_TTL seconds when that is set
+RESPONSE_CACHE_SIZE = 1024
+_response_cache: Optional[TTLCache] = None
+
 class LLMError(Exception):
     """Base exception for LLM-related errors."""
     pass
@@ -37,15 +59,24 @@ class LLMRetryError(LLMError):
     """Exception raised when retries are exhausted."""
     pass
 
+# Providers whose prefix is added to model names that have none, in order of
+# preference, with the config setting holding each one's API key; the first
+# provider with a key is used
+DEFAULT_PROVIDERS = (
+    ('openai', 'OPENAI_API_KEY'),
+    ('anthropic', 'ANTHROPIC_API_KEY'),
+    ('groq', 'GROQ_API_KEY'),
+    ('openrouter', 'OPENROUTER_API_KEY'),
+)
+
 def setup_api_keys() -> None:
     """Set up API keys from environment variables."""
-    providers = ['OPENAI', 'ANTHROPIC', 'GROQ', 'OPENROUTER']
-    for provider in providers:
-        key = getattr(config, f'{provider}_API_KEY')
+    for provider, key_name in DEFAULT_PROVIDERS:
+        key = getattr(config, key_name)
         if key:
-            logger.debug(f"API key set for provider: {provider}")
+            logger.debug(f"API key set for provider: {provider.upper()}")
         else:
-            logger.warning(f"No API key found for provider: {provider}")
+            logger.warning(f"No API key found for provider: {provider.upper()}")
     
     # Set up Ollama configuration if available
     if hasattr(config, 'OLLAMA_API_BASE') and config.OLLAMA_API_BASE:
@@ -73,78 +104,82 @@ def setup_api_keys() -> None:
     else:
         logger.warning(f"Missing AWS credentials for Bedrock integration - access_key: {bool(aws_access_key)}, secret_key: {bool(aws_secret_key)}, region: {aws_region}")
 
+# Whether setup_api_keys has run; deferred from import to init_llm() so that
+# importing this module doesn't write to os.environ
+_api_keys_ready = False
+
+def init_llm() -> None:
+    """Set up API keys for LiteLLM, once; called on startup and before each API call."""
+    global _api_keys_ready
+    if not _api_keys_ready:
+        setup_api_keys()
+        _api_keys_ready = True
+
 async def handle_error(error: Exception, attempt: int, max_attempts: int) -> None:
     """Handle API errors with appropriate delays and logging."""
     delay = RATE_LIMIT_DELAY if isinstance(error, litellm.exceptions.RateLimitError) else RETRY_DELAY
     logger.warning(f"Error on attempt {attempt + 1}/{max_attempts}: {str(error)}")
-    logger.debug(f"Waiting {delay} seconds before retry...")
+    logger.debug("Waiting %s seconds before retry...", delay)
     await asyncio.sleep(delay)
 
+# Task-specific system instructions
+TASK_INSTRUCTIONS: Dict[str, str] = {
+    "coding": (
+        "You are an expert programmer. Provide clean, efficient, and well-documented code. "
+        "Focus on best practices, security, and performance. Include error handling "
+        "and explain your implementation choices. Be precise and thorough."
+    ),
+    "reasoning": (
+        "You are a logical reasoning expert. Break down complex problems step by step. "
+        "Consider multiple perspectives, identify assumptions, and evaluate evidence critically. "
+        "Be thorough in your analysis and explain your reasoning clearly."
+    ),
+    "creative": (
+        "You are a creative assistant. Think outside the box and generate novel ideas. "
+        "Use vivid language, metaphors, and storytelling techniques. "
+        "Don't be constrained by conventional thinking."
+    ),
+    "chat": (
+        "You are a helpful, friendly assistant. Provide concise, accurate information. "
+        "Be conversational but efficient. Anticipate follow-up questions and provide "
+        "relevant context when appropriate."
+    )
+}
+
 def enhance_prompt_for_task(messages: List[Dict[str, Any]], task_type: str) -> List[Dict[str, Any]]:
     """
     Enhance the prompt with task-specific instructions to improve model performance.
     
     Args:
-        messages: The original message list
+        messages: The original message list, which is not modified
         task_type: Type of task (coding, creative, reasoning, chat, etc.)
         
     Returns:
-        Enhanced message list
+        Enhanced message list, or the original list if there is nothing to add
     """
     # Don't modify if no messages or task type is unknown
-    if not messages or task_type not in ["coding", "reasoning", "creative", "chat"]:
+    if not messages or task_type not in TASK_INSTRUCTIONS:
         return messages
     
-    # Create a copy to avoid modifying the original
-    enhanced_messages = messages.copy()
-    
-    # Task-specific system instructions
-    task_instructions = {
-        "coding": (
-            "You are an expert programmer. Provide clean, efficient, and well-documented code. "
-            "Focus on best practices, security, and performance. Include error handling "
-            "and explain your implementation choices. Be precise and thorough."
-        ),
-        "reasoning": (
-            "You are a logical reasoning expert. Break down complex problems step by step. "
-            "Consider multiple perspectives, identify assumptions, and evaluate evidence critically. "
-            "Be thorough in your analysis and explain your reasoning clearly."
-        ),
-        "creative": (
-            "You are a creative assistant. Think outside the box and generate novel ideas. "
-            "Use vivid language, metaphors, and storytelling techniques. "
-            "Don't be constrained by conventional thinking."
-        ),
-        "chat": (
-            "You are a helpful, friendly assistant. Provide concise, accurate information. "
-            "Be conversational but efficient. Anticipate follow-up questions and provide "
-            "relevant context when appropriate."
-        )
-    }
+    instructions = TASK_INSTRUCTIONS[task_type]
     
     # Find and modify system message if it exists
-    system_msg_index = None
-    for i, msg in enumerate(enhanced_messages):
+    for i, msg in enumerate(messages):
         if msg.get("role") == "system":
-            system_msg_index = i
+            # Append to a copy of the existing system message
+            current_content = msg.get("content", "")
+            if not current_content.endswith("."):
+                current_content += ". "
+            else:
+                current_content += " "
+            enhanced_messages = messages.copy()
+            enhanced_messages[i] = {**msg, "content": current_content + instructions}
             break
-    
-    if system_msg_index is not None:
-        # Append to existing system message
-        current_content = enhanced_messages[system_msg_index].get("content", "")
-        if not current_content.endswith("."):
-            current_content += ". "
-        else:
-            current_content += " "
-        enhanced_messages[system_msg_index]["content"] = current_content + task_instructions[task_type]
     else:
         # Insert new system message at the beginning
-        enhanced_messages.insert(0, {
-            "role": "system",
-            "content": task_instructions[task_type]
-        })
+        enhanced_messages = [{"role": "system", "content": instructions}, *messages]
     
-    logger.debug(f"Enhanced prompt with {task_type}-specific instructions")
+    logger.debug("Enhanced prompt with %s-specific instructions", task_type)
     return enhanced_messages
 
 def optimize_temperature(task_type: str, user_temperature: float) -> float:
@@ -172,6 +207,19 @@ def optimize_temperature(task_type: str, user_temperature: float) -> float:
     
     return task_temperatures.get(task_type, 0.0)  # Default to 0 if task type unknown
 
+# Keywords that mark a message's task type, in priority order. Each list is
+# compiled into one case-insensitive pattern, so the message is scanned once
+# per task type; like substring checks, they also match inside longer words.
+TASK_TYPE_KEYWORDS = {
+    "coding": ["code", "function", "programming", "script", "algorithm", "debug"],
+    "reasoning": ["explain", "why", "how", "analyze", "compare", "evaluate"],
+    "creative": ["story", "creative", "imagine", "design", "generate"],
+}
+TASK_TYPE_PATTERNS = [
+    (task_type, re.compile("|".join(map(re.escape, keywords)), re.IGNORECASE))
+    for task_type, keywords in TASK_TYPE_KEYWORDS.items()
+]
+
 def select_best_model_for_task(task_type: str, messages: List[Dict[str, Any]]) -> str:
     """
     Select the best model for a specific task type based on available models.
@@ -205,18 +253,198 @@ def select_best_model_for_task(task_type: str, messages: List[Dict[str, Any]]) -
                     break
             
             # Simple heuristics to determine task type
-            if any(kw in last_user_msg.lower() for kw in ["code", "function", "programming", "script", "algorithm", "debug"]):
-                task_type = "coding"
-            elif any(kw in last_user_msg.lower() for kw in ["explain", "why", "how", "analyze", "compare", "evaluate"]):
-                task_type = "reasoning"
-            elif any(kw in last_user_msg.lower() for kw in ["story", "creative", "imagine", "design", "generate"]):
-                task_type = "creative"
-            else:
-                task_type = "chat"
+            task_type = next(
+                (detected for detected, pattern in TASK_TYPE_PATTERNS if pattern.search(last_user_msg)),
+                "chat"
+            )
     
     # Return the appropriate model or fall back to default
     return available_models.get(task_type, default_model)
 
+@dataclass(frozen=True)
+class ModelProfile:
+    """Routing decisions for a model, which don't depend on the messages of a call.
+    
+    Attributes:
+        model (str): Model name to send to LiteLLM, including its provider prefix
+        max_tokens_param (Optional[str]): Parameter that carries max_tokens, or None to leave it out
+        provider (Optional[str]): Explicit LiteLLM provider, if any
+        api_base (Optional[str]): API base that overrides the caller's, if any
+        extra_headers (Optional[Mapping[str, str]]): Read-only extra HTTP headers to send, if any
+        model_id (Optional[str]): Model ID to use when the caller doesn't give one
+        is_anthropic (bool): Whether Anthropic prompt caching and thinking apply
+    """
+    model: str
+    max_tokens_param: Optional[str]
+    provider: Optional[str] = None
+    api_base: Optional[str] = None
+    extra_headers: Optional[Mapping[str, str]] = field(default=None, hash=False)
+    model_id: Optional[str] = None
+    is_anthropic: bool = False
+
+# Headers sent with every Claude call, shared read-only by the model profiles
+ANTHROPIC_EXTRA_HEADERS = MappingProxyType({"anthropic-beta": "output-128k-2025-02-19"})
+
+# Bedrock inference profile for Claude 3.7 Sonnet
+BEDROCK_CLAUDE_3_7_MODEL_ID = "arn:aws:bedrock:us-west-2:935064898258:inference-profile/us.anthropic.claude-3-7-sonnet-20250219-v1:0"
+
+# Substrings of lowercase model names that are served by Ollama, compiled
+# into one pattern so the name is scanned once
+OLLAMA_MODEL_IDENTIFIERS = ('qwen', 'mixtral', 'llama')
+OLLAMA_MODEL_RE = re.compile("|".join(OLLAMA_MODEL_IDENTIFIERS))
+
+@lru_cache(maxsize=256)
+def get_model_profile(model_name: str) -> ModelProfile:
+    """
+    Work out how to route a model through LiteLLM.
+    
+    The result only depends on the model name and the provider settings in
+    config, which don't change while running, so it is cached per model.
+    
+    Args:
+        model_name: Name of the model, with or without a provider prefix
+        
+    Returns:
+        The model's routing profile
+    """
+    # Ensure model_name includes a provider prefix for LiteLLM
+    if '/' not in model_name:
+        provider = next((name for name, key_name in DEFAULT_PROVIDERS if getattr(config, key_name)), None)
+        if provider:
+            logger.debug("Prefixing model_name with default provider '%s'", provider)
+            model_name = f"{provider}/{model_name}"
+    
+    model = model_name
+    provider = None
+    api_base = None
+    extra_headers = {}
+    model_id = None
+
+    # For Claude 3.7 in Bedrock, do not set max_tokens or max_tokens_to_sample
+    # as it causes errors with inference profiles
+    if model_name.startswith("bedrock/") and "claude-3-7" in model_name:
+        max_tokens_param = None
+    else:
+        max_tokens_param = "max_completion_tokens" if 'o1' in model_name else "max_tokens"
+
+    # Add Ollama-specific configuration
+    # Check if this is an Ollama model by looking at model name or config
+    is_ollama_model = False
+    lower_model_name = model_name.lower()
+    
+    # Check if model name contains Ollama-specific identifiers (qwen, mixtral, llama)
+    if OLLAMA_MODEL_RE.search(lower_model_name):
+        is_ollama_model = True
+        logger.debug("Detected Ollama model based on name: %s", model_name)
+    
+    # Also check explicit configuration
+    if hasattr(config, 'OLLAMA_PROVIDER') and config.OLLAMA_PROVIDER and config.OLLAMA_PROVIDER.lower() == 'ollama':
+        is_ollama_model = True
+        logger.debug("Using Ollama provider based on configuration")
+    
+    if is_ollama_model:
+        # Always ensure we have the ollama/ prefix for Ollama models
+        # First, strip any existing provider prefix (like 'openai/')
+        if '/' in model_name:
+            _, model_name = model_name.split('/', 1)
+        
+        # Set the model with ollama/ prefix
+        model = f"ollama/{model_name}"
+        
+        # Set API base if available
+        if hasattr(config, 'OLLAMA_API_BASE') and config.OLLAMA_API_BASE:
+            api_base = config.OLLAMA_API_BASE
+        
+        logger.debug("Using Ollama provider for model: %s with API base: %s", model, api_base or 'default')
+        
+        # For Ollama models, ensure we have the correct provider specified
+        provider = "ollama"
+
+    # Add Claude-specific headers
+    elif "claude" in lower_model_name or "anthropic" in lower_model_name:
+        # extra_headers["anthropic-beta"] = "max-tokens-3-5-sonnet-2024-07-15"
+        extra_headers.update(ANTHROPIC_EXTRA_HEADERS)
+        logger.debug("Added Claude-specific headers")
+
+    # Add OpenRouter-specific parameters
+    if model_name.startswith("openrouter/"):
+        # Add optional site URL and app name from config
+        if config.OR_SITE_URL:
+            extra_headers["HTTP-Referer"] = config.OR_SITE_URL
+        if config.OR_APP_NAME:
+            extra_headers["X-Title"] = config.OR_APP_NAME
+    
+    # Add Bedrock-specific parameters
+    if model_name.startswith("bedrock/") and "anthropic.claude-3-7-sonnet" in model_name:
+        model_id = BEDROCK_CLAUDE_3_7_MODEL_ID
+
+    # Anthropic prompt caching and thinking go by the name sent to LiteLLM,
+    # after any prefix changes above
+    lower_model = model.lower()
+    return ModelProfile(
+        model=model,
+        max_tokens_param=max_tokens_param,
+        provider=provider,
+        api_base=api_base,
+        extra_headers=MappingProxyType(extra_headers) if extra_headers else None,
+        model_id=model_id,
+        is_anthropic="claude" in lower_model or "anthropic" in lower_model
+    )
+
+def _apply_anthropic_cache_control(messages: List[Dict[str, Any]]) -> None:
+    """
+    Mark messages for Anthropic prompt caching, modifying them in place.
+    
+    The system prompt is checked by index, and the last two user messages
+    and last assistant message are found and marked in one backward pass.
+    
+    Args:
+        messages: Messages of the API call
+    """
+    # 1. Process the first message if it's a system prompt with string content
+    if messages and messages[0].get("role") == "system":
+        content = messages[0].get("content")
+        if isinstance(content, str):
+            # Wrap the string content in the required list structure
+            messages[0]["content"] = [
+                {"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}
+            ]
+        elif isinstance(content, list):
+            # If content is already a list, check if the first text block needs cache_control
+            for item in content:
+                if isinstance(item, dict) and item.get("type") == "text":
+                    if "cache_control" not in item:
+                        item["cache_control"] = {"type": "ephemeral"}
+                        break # Apply to the first text block only for system prompt
+
+    # 2. Apply cache control to the last two user messages and the last
+    # assistant message, found and updated in one backward pass
+    users_found = 0
+    assistant_found = False
+
+    for message in reversed(messages):
+        role = message.get("role")
+        if role == "user" and users_found < 2:
+            users_found += 1
+        elif role == "assistant" and not assistant_found:
+            assistant_found = True
+        else:
+            continue
+
+        content = message.get("content")
+        if isinstance(content, str):
+            message["content"] = [
+                {"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}
+            ]
+        elif isinstance(content, list):
+            for item in content:
+                if isinstance(item, dict) and item.get("type") == "text" and "cache_control" not in item:
+                    item["cache_control"] = {"type": "ephemeral"}
+
+        # Stop searching once all three messages are found
+        if users_found == 2 and assistant_found:
+            break
+
 def prepare_params(
     messages: List[Dict[str, Any]],
     model_name: str,
@@ -239,40 +467,23 @@ def prepare_params(
     if task_type and model_name == config.MODEL_TO_USE:
         suggested_model = select_best_model_for_task(task_type, messages)
         if suggested_model != model_name:
-            logger.debug(f"Task type '{task_type}' detected, switching from {model_name} to {suggested_model}")
+            logger.debug("Task type '%s' detected, switching from %s to %s", task_type, model_name, suggested_model)
             model_name = suggested_model
     
     # Optimize temperature based on task type if not explicitly set by user
     optimized_temperature = optimize_temperature(task_type, temperature)
     if optimized_temperature != temperature:
-        logger.debug(f"Optimizing temperature for task type '{task_type}': {temperature} → {optimized_temperature}")
+        logger.debug("Optimizing temperature for task type '%s': %s → %s", task_type, temperature, optimized_temperature)
         temperature = optimized_temperature
         
     # Enhance prompts with task-specific instructions
     if task_type != "auto":
-        enhanced_messages = enhance_prompt_for_task(messages, task_type)
-        if enhanced_messages != messages:
-            logger.debug(f"Enhanced prompt with {task_type}-specific instructions")
-            messages = enhanced_messages
+        messages = enhance_prompt_for_task(messages, task_type)
     
-    # Ensure model_name includes a provider prefix for LiteLLM
-    if '/' not in model_name:
-        if config.OPENAI_API_KEY:
-            provider = 'openai'
-        elif config.ANTHROPIC_API_KEY:
-            provider = 'anthropic'
-        elif config.GROQ_API_KEY:
-            provider = 'groq'
-        elif config.OPENROUTER_API_KEY:
-            provider = 'openrouter'
-        else:
-            provider = None
-        if provider:
-            logger.debug(f"Prefixing model_name with default provider '{provider}'")
-            model_name = f"{provider}/{model_name}"
+    profile = get_model_profile(model_name)
     
     params = {
-        "model": model_name,
+        "model": profile.model,
         "messages": messages,
         "temperature": temperature,
         "response_format": response_format,
@@ -289,163 +500,36 @@ def prepare_params(
 
     # Handle token limits
     if max_tokens is not None:
-        # For Claude 3.7 in Bedrock, do not set max_tokens or max_tokens_to_sample
-        # as it causes errors with inference profiles
-        if model_name.startswith("bedrock/") and "claude-3-7" in model_name:
-            logger.debug(f"Skipping max_tokens for Claude 3.7 model: {model_name}")
-            # Do not add any max_tokens parameter for Claude 3.7
+        if profile.max_tokens_param:
+            params[profile.max_tokens_param] = max_tokens
         else:
-            param_name = "max_completion_tokens" if 'o1' in model_name else "max_tokens"
-            params[param_name] = max_tokens
+            logger.debug("Skipping max_tokens for Claude 3.7 model: %s", profile.model)
 
     # Add tools if provided
     if tools:
-        params.update({
-            "tools": tools,
-            "tool_choice": tool_choice
-        })
-        logger.debug(f"Added {len(tools)} tools to API parameters")
-
-    # Add Ollama-specific configuration
-    # Check if this is an Ollama model by looking at model name or config
-    is_ollama_model = False
-    
-    # Check if model name contains Ollama-specific identifiers (qwen, mixtral, llama)
-    if any(identifier in model_name.lower() for identifier in ['qwen', 'mixtral', 'llama']):
-        is_ollama_model = True
-        logger.debug(f"Detected Ollama model based on name: {model_name}")
-    
-    # Also check explicit configuration
-    if hasattr(config, 'OLLAMA_PROVIDER') and config.OLLAMA_PROVIDER and config.OLLAMA_PROVIDER.lower() == 'ollama':
-        is_ollama_model = True
-        logger.debug(f"Using Ollama provider based on configuration")
-    
-    if is_ollama_model:
-        # Always ensure we have the ollama/ prefix for Ollama models
-        # First, strip any existing provider prefix (like 'openai/')
-        if '/' in model_name:
-            _, model_name = model_name.split('/', 1)
-        
-        # Set the model with ollama/ prefix
-        params["model"] = f"ollama/{model_name}"
-        
-        # Set API base if available
-        if hasattr(config, 'OLLAMA_API_BASE') and config.OLLAMA_API_BASE:
-            params["api_base"] = config.OLLAMA_API_BASE
-        
-        logger.debug(f"Using Ollama provider for model: {params['model']} with API base: {params.get('api_base', 'default')}")
-        
-        # For Ollama models, ensure we have the correct provider specified
-        params["provider"] = "ollama"
-        logger.debug(f"Set explicit provider='ollama' for model {model_name}")
-
-    # Add Claude-specific headers
-    elif "claude" in model_name.lower() or "anthropic" in model_name.lower():
-        params["extra_headers"] = {
-            # "anthropic-beta": "max-tokens-3-5-sonnet-2024-07-15"
-            "anthropic-beta": "output-128k-2025-02-19"
-        }
-        logger.debug("Added Claude-specific headers")
-
-    
-    # Add OpenRouter-specific parameters
-    if model_name.startswith("openrouter/"):
-        logger.debug(f"Preparing OpenRouter parameters for model: {model_name}")
-        
-        # Add optional site URL and app name from config
-        site_url = config.OR_SITE_URL
-        app_name = config.OR_APP_NAME
-        if site_url or app_name:
-            extra_headers = params.get("extra_headers", {})
-            if site_url:
-                extra_headers["HTTP-Referer"] = site_url
-            if app_name:
-                extra_headers["X-Title"] = app_name
-            params["extra_headers"] = extra_headers
-            logger.debug(f"Added OpenRouter site URL and app name to headers")
-    
-    # Add Bedrock-specific parameters
-    if model_name.startswith("bedrock/"):
-        logger.debug(f"Preparing AWS Bedrock parameters for model: {model_name}")
-        
-        if not model_id and "anthropic.claude-3-7-sonnet" in model_name:
-            params["model_id"] = "arn:aws:bedrock:us-west-2:935064898258:inference-profile/us.anthropic.claude-3-7-sonnet-20250219-v1:0"
-            logger.debug(f"Auto-set model_id for Claude 3.7 Sonnet: {params['model_id']}")
+        params["tools"] = tools
+        params["tool_choice"] = tool_choice
+        logger.debug("Added %d tools to API parameters", len(tools))
+
+    # Add provider-specific configuration
+    if profile.provider:
+        params["provider"] = profile.provider
+    if profile.api_base:
+        params["api_base"] = profile.api_base
+    if profile.extra_headers:
+        # Copied so that LiteLLM can't change the cached profile's headers
+        params["extra_headers"] = profile.extra_headers.copy()
+    if not model_id and profile.model_id:
+        params["model_id"] = profile.model_id
 
     # Apply Anthropic prompt caching (minimal implementation)
-    # Check model name *after* potential modifications (like adding bedrock/ prefix)
-    effective_model_name = params.get("model", model_name) # Use model from params if set, else original
-    if "claude" in effective_model_name.lower() or "anthropic" in effective_model_name.lower():
-        messages = params["messages"] # Direct reference, modification affects params
-
-        # Ensure messages is a list
-        if not isinstance(messages, list):
-            return params # Return early if messages format is unexpected
-
-        # 1. Process the first message if it's a system prompt with string content
-        if messages and messages[0].get("role") == "system":
-            content = messages[0].get("content")
-            if isinstance(content, str):
-                # Wrap the string content in the required list structure
-                messages[0]["content"] = [
-                    {"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}
-                ]
-            elif isinstance(content, list):
-                 # If content is already a list, check if the first text block needs cache_control
-                 for item in content:
-                     if isinstance(item, dict) and item.get("type") == "text":
-                         if "cache_control" not in item:
-                             item["cache_control"] = {"type": "ephemeral"}
-                             break # Apply to the first text block only for system prompt
-
-        # 2. Find and process relevant user and assistant messages
-        last_user_idx = -1
-        second_last_user_idx = -1
-        last_assistant_idx = -1
-
-        for i in range(len(messages) - 1, -1, -1):
-            role = messages[i].get("role")
-            if role == "user":
-                if last_user_idx == -1:
-                    last_user_idx = i
-                elif second_last_user_idx == -1:
-                    second_last_user_idx = i
-            elif role == "assistant":
-                if last_assistant_idx == -1:
-                    last_assistant_idx = i
-
-            # Stop searching if we've found all needed messages
-            if last_user_idx != -1 and second_last_user_idx != -1 and last_assistant_idx != -1:
-                 break
-
-        # Helper function to apply cache control
-        def apply_cache_control(message_idx: int, message_role: str):
-            if message_idx == -1:
-                return
-
-            message = messages[message_idx]
-            content = message.get("content")
-
-            if isinstance(content, str):
-                message["content"] = [
-                    {"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}
-                ]
-            elif isinstance(content, list):
-                for item in content:
-                    if isinstance(item, dict) and item.get("type") == "text":
-                        if "cache_control" not in item:
-                           item["cache_control"] = {"type": "ephemeral"}
-
-        # Apply cache control to the identified messages
-        apply_cache_control(last_user_idx, "last user")
-        apply_cache_control(second_last_user_idx, "second last user")
-        apply_cache_control(last_assistant_idx, "last assistant")
+    if profile.is_anthropic and isinstance(messages, list):
+        _apply_anthropic_cache_control(messages)
 
     # Add reasoning_effort for Anthropic models if enabled
     use_thinking = enable_thinking if enable_thinking is not None else False
-    is_anthropic = "anthropic" in effective_model_name.lower() or "claude" in effective_model_name.lower()
 
-    if is_anthropic and use_thinking:
+    if profile.is_anthropic and use_thinking:
         effort_level = reasoning_effort if reasoning_effort else 'low'
         params["reasoning_effort"] = effort_level
         params["temperature"] = 1.0 # Required by Anthropic when reasoning_effort is used
@@ -453,6 +537,66 @@ def prepare_params(
 
     return params
 
+def _response_cache_key(params: Dict[str, Any]) -> Optional[str]:
+    """
+    Get the response cache key for an API call, or None if its response shouldn't be cached.
+    
+    Only deterministic calls are cached: temperature 0, no streaming and no
+    tools. The key hashes every parameter, so any difference in model,
+    messages or options is a different entry.
+    """
+    global _response_cache
+    
+    if config.LLM_RESPONSE_CACHE_TTL <= 0:
+        return None
+    if params["temperature"] != 0 or params["stream"] or params.get("tools"):
+        return None
+    
+    if _response_cache is None:
+        _response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=config.LLM_RESPONSE_CACHE_TTL)
+    try:
+        payload = orjson.dumps(params, default=str, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        # e.g. text with lone surrogates, which orjson won't encode
+        return None
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+async def race_provider_prefixes(params: Dict[str, Any], prefixes: Tuple[str, ...]) -> Any:
+    """
+    Call the model under several provider prefixes at once and return the first success.
+    
+    All requests are started before any is awaited, so they are in flight
+    together; the rest are cancelled as soon as one succeeds.
+    
+    Args:
+        params: Parameters for litellm.acompletion, with an unprefixed model
+        prefixes: Provider prefixes to try, e.g. ("ollama", "openai")
+        
+    Returns:
+        The first successful response
+        
+    Raises:
+        Exception: The last error, if every request fails
+    """
+    tasks = {
+        asyncio.create_task(litellm.acompletion(**{**params, "model": f"{prefix}/{params['model']}"})): prefix
+        for prefix in prefixes
+    }
+    last_error = None
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    logger.info(f"Provider prefix '{tasks[task]}' succeeded for model {params['model']}")
+                    return task.result()
+                last_error = task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+    raise last_error
+
 async def make_llm_api_call(
     messages: List[Dict[str, Any]],
     model_name: str,
@@ -497,8 +641,10 @@ async def make_llm_api_call(
         LLMRetryError: If API call fails after retries
         LLMError: For other API-related errors
     """
+    init_llm()
+    
     # debug <timestamp>.json messages 
-    logger.debug(f"Making LLM API call to model: {model_name} (Thinking: {enable_thinking}, Effort: {reasoning_effort})")
+    logger.debug("Making LLM API call to model: %s (Thinking: %s, Effort: %s)", model_name, enable_thinking, reasoning_effort)
     params = prepare_params(
         messages=messages,
         model_name=model_name,
@@ -516,15 +662,26 @@ async def make_llm_api_call(
         reasoning_effort=reasoning_effort,
         task_type=task_type
     )
+    cache_key = _response_cache_key(params)
+    if cache_key is not None:
+        cached_response = _response_cache.get(cache_key)
+        if cached_response is not None:
+            logger.debug("Using cached API response for %s", model_name)
+            # Copy so callers can't change the cached response
+            return copy.deepcopy(cached_response)
+    
     last_error = None
     for attempt in range(MAX_RETRIES):
         try:
-            logger.debug(f"Attempt {attempt + 1}/{MAX_RETRIES}")
-            # logger.debug(f"API request parameters: {json.dumps(params, indent=2)}")
+            logger.debug("Attempt %d/%d", attempt + 1, MAX_RETRIES)
+            # logger.debug(f"API request parameters: {orjson.dumps(params, default=str, option=orjson.OPT_INDENT_2).decode()}")
             
             response = await litellm.acompletion(**params)
-            logger.debug(f"Successfully received API response from {model_name}")
-            logger.debug(f"Response: {response}")
+            logger.debug("Successfully received API response from %s", model_name)
+            # The response is only converted to a string if debug logging is on
+            logger.debug("Response: %s", response)
+            if cache_key is not None:
+                _response_cache[cache_key] = copy.deepcopy(response)
             return response
             
         except (litellm.exceptions.RateLimitError, OpenAIError, json.JSONDecodeError) as e:
@@ -537,6 +694,12 @@ async def make_llm_api_call(
                 if config.OLLAMA_PROVIDER and config.OLLAMA_PROVIDER.lower() == 'ollama':
                     logger.warning("LLM Provider missing, retrying with 'ollama/' prefix")
                     params['model'] = f"ollama/{params['model']}"
+                elif config.LLM_RACE_PROVIDER_PREFIXES:
+                    logger.warning("LLM Provider missing, retrying with 'ollama/' and 'openai/' prefixes at once")
+                    try:
+                        return await race_provider_prefixes(params, ("ollama", "openai"))
+                    except Exception as race_error:
+                        raise LLMError(f"API call failed: {str(race_error)}")
                 else:
                     logger.warning("LLM Provider missing, retrying with 'openai/' prefix")
                     params['model'] = f"openai/{params['model']}"
@@ -554,33 +717,91 @@ async def make_llm_api_call(
     raise LLMRetryError(error_msg)
 
 # Functions for Ollama model management
+
+# Shared httpx client for Ollama requests, created on first use so that
+# connections are kept alive between calls; closed by aclose(). HTTP/2 lets
+# concurrent polls and pulls share one connection behind an HTTP/2 proxy
+_ollama_client: Optional[httpx.AsyncClient] = None
+
+def _get_ollama_client() -> httpx.AsyncClient:
+    """Get the shared httpx client for Ollama requests."""
+    global _ollama_client
+    if _ollama_client is None or _ollama_client.is_closed:
+        _ollama_client = httpx.AsyncClient(
+            http2=h2 is not None,
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=16),
+        )
+    return _ollama_client
+
+async def aclose() -> None:
+    """Close the shared Ollama client."""
+    global _ollama_client
+    if _ollama_client is not None:
+        await _ollama_client.aclose()
+        _ollama_client = None
+
+# Seconds the Ollama model list is reused before /api/tags is queried again
+OLLAMA_MODELS_CACHE_TTL = 5.0
+
+# (fetched at, model list, model names) from the last /api/tags call
+_ollama_models_cache: Optional[Tuple[float, Dict[str, Any], frozenset]] = None
+_ollama_models_lock = asyncio.Lock()
+
+def invalidate_ollama_models_cache() -> None:
+    """Drop the cached Ollama model list so the next lookup queries the server."""
+    global _ollama_models_cache
+    _ollama_models_cache = None
+
+async def _get_ollama_models() -> Tuple[Dict[str, Any], frozenset]:
+    """Get the Ollama model list and the set of model names, cached for OLLAMA_MODELS_CACHE_TTL."""
+    global _ollama_models_cache
+    if not config.OLLAMA_API_BASE:
+        raise LLMError("Ollama API base URL not configured")
+    
+    try:
+        async with _ollama_models_lock:
+            cached = _ollama_models_cache
+            if cached is not None and time.monotonic() - cached[0] < OLLAMA_MODELS_CACHE_TTL:
+                return cached[1], cached[2]
+            
+            response = await _get_ollama_client().get(f"{config.OLLAMA_API_BASE}/api/tags")
+            if response.status_code != 200:
+                raise LLMError(f"Failed to list Ollama models: {response.text}")
+            
+            models = response.json()
+            names = frozenset(model["name"] for model in models.get("models", []))
+            _ollama_models_cache = (time.monotonic(), models, names)
+            return models, names
+    except Exception as e:
+        logger.error(f"Error listing Ollama models: {str(e)}")
+        raise LLMError(f"Failed to communicate with Ollama server: {str(e)}")
+
 async def list_ollama_models() -> Dict[str, Any]:
     """
     List all available models on the Ollama server.
     
+    The list is cached for OLLAMA_MODELS_CACHE_TTL seconds and refreshed
+    after a model download completes.
+    
     Returns:
         Dict containing the list of available models and their details
     
     Raises:
         LLMError: If there's an error communicating with the Ollama server
     """
-    import aiohttp
-    
-    if not config.OLLAMA_API_BASE:
-        raise LLMError("Ollama API base URL not configured")
-    
+    models, _ = await _get_ollama_models()
+    return models
+
+def _parse_pull_progress(line: str) -> Optional[Dict[str, Any]]:
+    """Parse one line of Ollama pull progress, or return None if it is blank or invalid."""
+    if not line.strip():
+        return None
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{config.OLLAMA_API_BASE}/api/tags") as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise LLMError(f"Failed to list Ollama models: {error_text}")
-                
-                result = await response.json()
-                return result
-    except Exception as e:
-        logger.error(f"Error listing Ollama models: {str(e)}")
-        raise LLMError(f"Failed to communicate with Ollama server: {str(e)}")
+        return orjson.loads(line)
+    except orjson.JSONDecodeError:
+        logger.warning(f"Received invalid JSON from Ollama: {line}")
+        return None
 
 async def download_ollama_model(model_name: str) -> AsyncGenerator[Dict[str, Any], None]:
     """
@@ -595,32 +816,27 @@ async def download_ollama_model(model_name: str) -> AsyncGenerator[Dict[str, Any
     Raises:
         LLMError: If there's an error downloading the model
     """
-    import aiohttp
-    import json
-    
     if not config.OLLAMA_API_BASE:
         raise LLMError("Ollama API base URL not configured")
     
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{config.OLLAMA_API_BASE}/api/pull",
-                json={"name": model_name},
-                timeout=None  # No timeout for long downloads
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise LLMError(f"Failed to download model {model_name}: {error_text}")
-                
-                # Stream the response as it comes in
-                async for line in response.content:
-                    if line:
-                        try:
-                            progress = json.loads(line)
-                            yield progress
-                        except json.JSONDecodeError:
-                            logger.warning(f"Received invalid JSON from Ollama: {line}")
-                            continue
+        async with _get_ollama_client().stream(
+            "POST",
+            f"{config.OLLAMA_API_BASE}/api/pull",
+            json={"name": model_name},
+            timeout=None  # No timeout for long downloads
+        ) as response:
+            if response.status_code != 200:
+                error_text = (await response.aread()).decode(errors="replace")
+                raise LLMError(f"Failed to download model {model_name}: {error_text}")
+            
+            # Stream the progress lines as they come in
+            async for line in response.aiter_lines():
+                progress = _parse_pull_progress(line)
+                if progress is not None:
+                    yield progress
+            
+            invalidate_ollama_models_cache()
     except Exception as e:
         logger.error(f"Error downloading Ollama model {model_name}: {str(e)}")
         raise LLMError(f"Failed to download model {model_name}: {str(e)}")
@@ -637,8 +853,7 @@ async def select_ollama_model(model_name: str) -> bool:
     """
     # Check if the model exists on the Ollama server
     try:
-        models = await list_ollama_models()
-        available_models = [model["name"] for model in models.get("models", [])]
+        _, available_models = await _get_ollama_models()
         
         if model_name not in available_models:
             logger.warning(f"Model {model_name} not found on Ollama server")
@@ -651,84 +866,3 @@ async def select_ollama_model(model_name: str) -> bool:
     except Exception as e:
         logger.error(f"Error selecting Ollama model: {str(e)}")
         return False
-
-# Initialize API keys on module import
-setup_api_keys()
-
-# Test code for OpenRouter integration
-async def test_openrouter():
-    """Test the OpenRouter integration with a simple query."""
-    test_messages = [
-        {"role": "user", "content": "Hello, can you give me a quick test response?"}
-    ]
-    
-    try:
-        # Test with standard OpenRouter model
-        print("\n--- Testing standard OpenRouter model ---")
-        response = await make_llm_api_call(
-            model_name="openrouter/openai/gpt-4o-mini",
-            messages=test_messages,
-            temperature=0.7,
-            max_tokens=100
-        )
-        print(f"Response: {response.choices[0].message.content}")
-        
-        # Test with deepseek model
-        print("\n--- Testing deepseek model ---")
-        response = await make_llm_api_call(
-            model_name="openrouter/deepseek/deepseek-r1-distill-llama-70b",
-            messages=test_messages,
-            temperature=0.7,
-            max_tokens=100
-        )
-        print(f"Response: {response.choices[0].message.content}")
-        print(f"Model used: {response.model}")
-        
-        # Test with Mistral model
-        print("\n--- Testing Mistral model ---")
-        response = await make_llm_api_call(
-            model_name="openrouter/mistralai/mixtral-8x7b-instruct",
-            messages=test_messages,
-            temperature=0.7,
-            max_tokens=100
-        )
-        print(f"Response: {response.choices[0].message.content}")
-        print(f"Model used: {response.model}")
-        
-        return True
-    except Exception as e:
-        print(f"Error testing OpenRouter: {str(e)}")
-        return False
-
-async def test_bedrock():
-    """Test the AWS Bedrock integration with a simple query."""
-    test_messages = [
-        {"role": "user", "content": "Hello, can you give me a quick test response?"}
-    ]
-    
-    try:    
-        response = await make_llm_api_call(
-            model_name="bedrock/anthropic.claude-3-7-sonnet-20250219-v1:0",
-            model_id="arn:aws:bedrock:us-west-2:935064898258:inference-profile/us.anthropic.claude-3-7-sonnet-20250219-v1:0",
-            messages=test_messages,
-            temperature=0.7,
-            # Claude 3.7 has issues with max_tokens, so omit it
-            # max_tokens=100
-        )
-        print(f"Response: {response.choices[0].message.content}")
-        print(f"Model used: {response.model}")
-        
-        return True
-    except Exception as e:
-        print(f"Error testing Bedrock: {str(e)}")
-        return False
-
-if __name__ == "__main__":
-    import asyncio
-        
-    test_success = asyncio.run(test_bedrock())
-    
-    if test_success:
-        print("\n✅ integration test completed successfully!")
-    else:
-        print("\n❌ Bedrock integration test failed!")
@@ -4,37 +4,168 @@ This helps analyze how the automatic model selection is working in real-world us
 """
 
 import logging
-import json
+import orjson
 import os
 import asyncio
-from datetime import datetime, timedelta
+import atexit
+import queue
+import threading
+from collections import Counter
+from operator import itemgetter
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from datetime import datetime
 from typing import Dict, Any, List, Optional
 
-from services.supabase import DBConnection
+from services.supabase import get_client
 from utils.logger import logger as app_logger
 
 # Set up file logger
 model_logger = logging.getLogger("model_selection")
 model_logger.setLevel(logging.INFO)
 
-# Create logs directory if it doesn't exist
-os.makedirs("/app/logs/model_selection", exist_ok=True)
+MODEL_SELECTION_LOG_DIR = "/app/logs/model_selection"
+# Current log file; rotated backups get a date suffix
+MODEL_SELECTION_LOG_FILE = "selection.log"
 
-# Add file handler
-file_handler = logging.FileHandler(f"/app/logs/model_selection/selection_{datetime.now().strftime('%Y%m%d')}.log")
-file_handler.setLevel(logging.INFO)
+class _UnformattedQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the listener thread."""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Messages are pre-serialized strings without args, so the record can
+        # be handed over as is
+        return record
+
+# Records go through a queue so the file is formatted and written on a
+# background thread rather than in the calling request. The file and thread
+# are only set up once something is logged.
+_file_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_file_log_listener: Optional[QueueListener] = None
+_file_log_queue_handler: Optional[QueueHandler] = None
+_file_log_lock = threading.Lock()
+
+def _ensure_file_handler() -> None:
+    """Open the model selection log file and start its writer thread, once."""
+    global _file_log_listener, _file_log_queue_handler
+    if _file_log_listener is not None:
+        return
+    with _file_log_lock:
+        if _file_log_listener is not None:
+            return
+        
+        # Create logs directory if it doesn't exist
+        os.makedirs(MODEL_SELECTION_LOG_DIR, exist_ok=True)
+        
+        # Add file handler, rolled over to a dated backup at midnight UTC
+        file_handler = TimedRotatingFileHandler(
+            os.path.join(MODEL_SELECTION_LOG_DIR, MODEL_SELECTION_LOG_FILE),
+            when="midnight", utc=True, backupCount=14, encoding="utf-8", delay=True
+        )
+        file_handler.setLevel(logging.INFO)
+        
+        # Create formatter
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+        file_handler.setFormatter(formatter)
+        
+        listener = QueueListener(_file_log_queue, file_handler, respect_handler_level=True)
+        listener.start()
+        _file_log_queue_handler = _UnformattedQueueHandler(_file_log_queue)
+        model_logger.addHandler(_file_log_queue_handler)
+        _file_log_listener = listener
+
+def stop_file_log_listener() -> None:
+    """Write any queued records, stop the log file thread and close the file."""
+    global _file_log_listener, _file_log_queue_handler
+    with _file_log_lock:
+        if _file_log_listener is None:
+            return
+        model_logger.removeHandler(_file_log_queue_handler)
+        _file_log_listener.stop()
+        for handler in _file_log_listener.handlers:
+            handler.close()
+        _file_log_listener = None
+        _file_log_queue_handler = None
+
+atexit.register(stop_file_log_listener)
+
+# Event loop on a daemon thread for database logging from code with no running loop
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
 
-# Create formatter
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """Get the background logging loop, starting its thread on first use or if it was closed."""
+    global _background_loop
+    loop = _background_loop
+    if loop is not None and not loop.is_closed():
+        return loop
+    with _background_loop_lock:
+        if _background_loop is None or _background_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="model-selection-db-logger", daemon=True).start()
+            _background_loop = loop
+    return _background_loop
 
-# Add handler to logger
-model_logger.addHandler(file_handler)
+# Pending database rows, written in batches by a background flusher so each
+# selection doesn't cost its own round trip to Supabase
+DB_LOG_BATCH_SIZE = 50
+DB_LOG_FLUSH_INTERVAL = 2.0  # seconds
+
+_pending_rows: List[Dict[str, Any]] = []
+_db_log_loop: Optional[asyncio.AbstractEventLoop] = None
+_db_flusher_task: Optional[asyncio.Task] = None
+
+async def _insert_selection_rows(rows: List[Dict[str, Any]]) -> None:
+    """Insert model_selection_logs rows in a single request."""
+    client = await get_client()
+    await client.table("model_selection_logs").insert(rows).execute()
+
+async def _write_pending_rows() -> None:
+    """Write all pending rows in one insert."""
+    global _pending_rows
+    if not _pending_rows:
+        return
+    rows, _pending_rows = _pending_rows, []
+    try:
+        await _insert_selection_rows(rows)
+        app_logger.debug(f"Logged {len(rows)} model selections to database")
+    except Exception as e:
+        app_logger.error(f"Failed to log {len(rows)} model selections to database: {e}")
+
+async def _flush_selection_rows() -> None:
+    """Write pending rows every DB_LOG_FLUSH_INTERVAL."""
+    while True:
+        await asyncio.sleep(DB_LOG_FLUSH_INTERVAL)
+        # Shielded so a shutdown mid-write doesn't lose the batch
+        await asyncio.shield(_write_pending_rows())
+
+def start_db_log_flusher() -> None:
+    """Start the background task that batches model selection rows into the database."""
+    global _db_log_loop, _db_flusher_task
+    if _db_flusher_task is not None and not _db_flusher_task.done():
+        return
+    _db_log_loop = asyncio.get_running_loop()
+    _db_flusher_task = asyncio.create_task(_flush_selection_rows())
+
+async def stop_db_log_flusher() -> None:
+    """Stop the flusher and write any rows still pending."""
+    global _db_log_loop, _db_flusher_task
+    if _db_flusher_task is None:
+        return
+    _db_flusher_task.cancel()
+    try:
+        await _db_flusher_task
+    except asyncio.CancelledError:
+        pass
+    _db_log_loop = None
+    _db_flusher_task = None
+    await _write_pending_rows()
 
 async def log_model_selection_to_db(prompt: str, task_type: str, confidence: float, selected_model: str, override_reason: Optional[str] = None) -> None:
     """
     Log model selection information to the Supabase database.
     
+    The row is batched by the flusher when it is running on this event loop,
+    otherwise it is inserted directly.
+    
     Args:
         prompt: The user's prompt (truncated for privacy)
         task_type: The classified task type
@@ -46,19 +177,23 @@ async def log_model_selection_to_db(prompt: str, task_type: str, confidence: flo
         # Truncate prompt for privacy (just log first 50 chars)
         truncated_prompt = prompt[:50] + "..." if len(prompt) > 50 else prompt
         
-        # Connect to Supabase
-        db = DBConnection()
-        client = await db.client
-        
-        # Insert log entry
-        await client.table("model_selection_logs").insert({
+        row = {
             "prompt_snippet": truncated_prompt,
             "prompt_length": len(prompt),
             "task_type": task_type,
             "confidence": confidence,
             "selected_model": selected_model,
             "override_reason": override_reason
-        }).execute()
+        }
+        
+        # Batch the row if the flusher is running on this loop
+        if _db_flusher_task is not None and asyncio.get_running_loop() is _db_log_loop:
+            _pending_rows.append(row)
+            if len(_pending_rows) >= DB_LOG_BATCH_SIZE:
+                await _write_pending_rows()
+            return
+        
+        await _insert_selection_rows([row])
         
         app_logger.info(f"Logged model selection to database: {selected_model} for {task_type} task")
     except Exception as e:
@@ -75,37 +210,51 @@ def log_model_selection(prompt: str, task_type: str, confidence: float, selected
         selected_model: The model that was selected
         override_reason: Reason for overriding the classification (if applicable)
     """
-    # Truncate prompt for privacy (just log first 50 chars)
-    truncated_prompt = prompt[:50] + "..." if len(prompt) > 50 else prompt
-    
-    # Log to file
-    log_data = {
-        "timestamp": datetime.now().isoformat(),
-        "prompt_preview": truncated_prompt,
-        "prompt_length": len(prompt),
-        "task_type": task_type,
-        "confidence": round(confidence, 2),
-        "selected_model": selected_model,
-        "override_applied": override_reason is not None,
-        "override_reason": override_reason
-    }
-    
-    model_logger.info(json.dumps(log_data))
+    # Log to file, skipping the serialization if the record would be dropped
+    if model_logger.isEnabledFor(logging.INFO):
+        _ensure_file_handler()
+        
+        # Truncate prompt for privacy (just log first 50 chars)
+        prompt_length = len(prompt)
+        truncated_prompt = prompt[:50] + "..." if prompt_length > 50 else prompt
+        
+        log_data = {
+            "timestamp": datetime.now().isoformat(),
+            "prompt_preview": truncated_prompt,
+            "prompt_length": prompt_length,
+            "task_type": task_type,
+            "confidence": round(float(confidence), 2),
+            "selected_model": selected_model,
+            "override_applied": override_reason is not None,
+            "override_reason": override_reason
+        }
+        
+        model_logger.info(orjson.dumps(log_data).decode())
     
-    # Also log to database asynchronously
+    # Also log to database asynchronously, without waiting for the insert
     try:
-        # Create a new event loop for the async call
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(log_model_selection_to_db(prompt, task_type, confidence, selected_model, override_reason))
-        loop.close()
+        coro = log_model_selection_to_db(prompt, task_type, confidence, selected_model, override_reason)
+        try:
+            # If we're in an event loop, create a task on it
+            asyncio.get_running_loop()
+            asyncio.create_task(coro)
+        except RuntimeError:
+            # No running event loop, hand the insert to the background loop
+            asyncio.run_coroutine_threadsafe(coro, _get_background_loop())
     except Exception as e:
         app_logger.error(f"Error calling async database logging: {e}")
 
+# Reads the columns of a get_selection_rollup row in one call
+_rollup_fields = itemgetter("selected_model", "task_type", "selections", "confidence_sum", "override_count")
+
 async def get_selection_stats_from_db(days: int = 7) -> Dict[str, Any]:
     """
     Get model selection statistics from the database for the past N days.
     
+    The logs are aggregated by the get_selection_rollup function, so only one
+    row per (task type, model) group is transferred; a window with no logs
+    comes back as no rows and returns the empty stats without further queries.
+    
     Args:
         days: Number of days to analyze
         
@@ -114,23 +263,15 @@ async def get_selection_stats_from_db(days: int = 7) -> Dict[str, Any]:
     """
     try:
         # Connect to Supabase
-        db = DBConnection()
-        client = await db.client
-        
-        # Calculate date range
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
+        client = await get_client()
         
-        # Query the database
-        response = await client.table("model_selection_logs")\
-            .select("*")\
-            .gte("created_at", start_date.isoformat())\
-            .lte("created_at", end_date.isoformat())\
-            .execute()
+        # Aggregate in the database; one row comes back per
+        # (task type, model) group rather than per selection
+        response = await client.rpc("get_selection_rollup", {"p_days": days}).execute()
         
-        logs = response.data
+        groups = response.data
         
-        if not logs:
+        if not groups:
             return {
                 "total_selections": 0,
                 "models_used": {},
@@ -139,34 +280,24 @@ async def get_selection_stats_from_db(days: int = 7) -> Dict[str, Any]:
                 "override_rate": 0
             }
         
-        # Calculate statistics
-        models_used = {}
-        task_types = {}
+        # Combine the groups into per-model and per-task totals
+        models_used = Counter()
+        task_types = Counter()
         confidence_sum = 0
         override_count = 0
+        total = 0
         
-        for log in logs:
-            # Count models used
-            model = log.get("selected_model")
-            models_used[model] = models_used.get(model, 0) + 1
-            
-            # Count task types
-            task = log.get("task_type")
-            task_types[task] = task_types.get(task, 0) + 1
-            
-            # Sum confidence scores
-            confidence_sum += log.get("confidence", 0)
-            
-            # Count overrides
-            if log.get("override_reason"):
-                override_count += 1
-        
-        total = len(logs)
+        for model, task, count, group_confidence_sum, group_override_count in map(_rollup_fields, groups):
+            models_used[model] += count
+            task_types[task] += count
+            confidence_sum += group_confidence_sum or 0
+            override_count += group_override_count
+            total += count
         
         return {
             "total_selections": total,
-            "models_used": models_used,
-            "task_types": task_types,
+            "models_used": dict(models_used),
+            "task_types": dict(task_types),
             "confidence_avg": round(confidence_sum / total, 2) if total > 0 else 0,
             "override_rate": round(override_count / total * 100, 1) if total > 0 else 0
         }
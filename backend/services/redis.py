@@ -1,7 +1,6 @@
 import redis.asyncio as redis
-import os
-from dotenv import load_dotenv
 import asyncio
+from utils.config import config
 from utils.logger import logger
 from typing import List, Any
 
@@ -15,19 +14,14 @@ REDIS_KEY_TTL = 3600 * 24  # 24 hour TTL as safety mechanism
 
 
 def initialize():
-    """Initialize Redis connection using environment variables."""
+    """Initialize Redis connection using the application configuration."""
     global client
 
-    # Load environment variables if not already loaded
-    load_dotenv()
-
-    # Get Redis configuration
-    redis_host = os.getenv('REDIS_HOST', 'redis')
-    redis_port = int(os.getenv('REDIS_PORT', 6379))
-    redis_password = os.getenv('REDIS_PASSWORD', '')
-    # Convert string 'True'/'False' to boolean
-    redis_ssl_str = os.getenv('REDIS_SSL', 'False')
-    redis_ssl = redis_ssl_str.lower() == 'true'
+    # Get Redis configuration, loaded once from the environment by utils.config
+    redis_host = config.REDIS_HOST
+    redis_port = config.REDIS_PORT
+    redis_password = config.REDIS_PASSWORD
+    redis_ssl = config.REDIS_SSL
 
     logger.info(f"Initializing Redis connection to {redis_host}:{redis_port}")
 
@@ -50,10 +50,17 @@ class DBConnection:
     @classmethod
     async def disconnect(cls):
         """Disconnect from the database."""
-        if cls._client:
+        global _client
+        # Drop the module-level cache even if the singleton has no client, so
+        # get_client() never hands out a closed one
+        _client = None
+        # initialize() sets the client on the singleton instance, not the class
+        instance = cls._instance
+        if instance is not None and instance._client:
             logger.info("Disconnecting from Supabase database")
-            await cls._client.close()
-            cls._initialized = False
+            await instance._client.close()
+            instance._client = None
+            instance._initialized = False
             logger.info("Database disconnected successfully")
 
     @property
@@ -67,4 +74,12 @@ class DBConnection:
             raise RuntimeError("Database not initialized")
         return self._client
 
+# Client cached at module level so hot paths skip the DBConnection lookup
+_client: Optional[AsyncClient] = None
 
+async def get_client() -> AsyncClient:
+    """Get the shared Supabase client, initializing the connection on first use."""
+    global _client
+    if _client is None:
+        _client = await DBConnection().client
+    return _client
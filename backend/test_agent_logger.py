@@ -0,0 +1,50 @@
+"""
+Tests for the sampling and deduplication of agent actions written to the database.
+"""
+
+import pytest
+
+from services import agent_logger
+
+TOOL_DETAILS = {"tool_name": "web_search", "tool_args": {"query": "weather"}}
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Patch the dedupe clock with a settable time and clear the recent calls."""
+    now = [1000.0]
+    monkeypatch.setattr(agent_logger.time, "monotonic", lambda: now[0])
+    agent_logger._recent_tool_calls.clear()
+    yield now
+    agent_logger._recent_tool_calls.clear()
+
+def sample(monkeypatch, value):
+    monkeypatch.setattr(agent_logger.random, "random", lambda: value)
+
+def test_repeats_survive_a_sampled_out_call(monkeypatch, clock):
+    sample(monkeypatch, 0.0)
+    assert agent_logger._prepare_db_details("thread", "tool_usage", TOOL_DETAILS) is not None
+
+    # Two duplicates within the dedupe window are suppressed and counted
+    assert agent_logger._prepare_db_details("thread", "tool_usage", TOOL_DETAILS) is None
+    assert agent_logger._prepare_db_details("thread", "tool_usage", TOOL_DETAILS) is None
+
+    # The next call after the window is sampled out; its count must be kept
+    clock[0] += 2 * agent_logger.DB_LOG_DEDUPE_WINDOW
+    sample(monkeypatch, 0.99)
+    assert agent_logger._prepare_db_details("thread", "tool_usage", TOOL_DETAILS) is None
+
+    clock[0] += 2 * agent_logger.DB_LOG_DEDUPE_WINDOW
+    sample(monkeypatch, 0.0)
+    details = agent_logger._prepare_db_details("thread", "tool_usage", TOOL_DETAILS)
+    assert details["repeat_count"] == 2
+    assert details["sample_rate"] == agent_logger.DB_LOG_SAMPLE_RATES["tool_usage"]
+
+    # The count is reset once it has been written
+    clock[0] += 2 * agent_logger.DB_LOG_DEDUPE_WINDOW
+    details = agent_logger._prepare_db_details("thread", "tool_usage", TOOL_DETAILS)
+    assert "repeat_count" not in details
+
+def test_errors_are_always_written(monkeypatch, clock):
+    sample(monkeypatch, 0.99)
+    details = {**TOOL_DETAILS, "error": "timeout"}
+    assert agent_logger._prepare_db_details("thread", "tool_usage", details) is details
@@ -0,0 +1,86 @@
+"""
+Tests for the keyword overrides in the embedding task classifier's model selection.
+The embedding classifier is patched out, so no embedding service is needed.
+"""
+
+import numpy as np
+import pytest
+
+from services import embedding_task_classifier as classifier
+from services.embedding_task_classifier import TASK_MODELS
+
+LONG_PROMPT = " ".join(["word"] * 101)
+
+@pytest.fixture
+def classify(monkeypatch):
+    """Patch the embedding classifier to return a fixed task type, recording calls."""
+    calls = []
+
+    def set_task_type(task_type):
+        def fake_classify(prompt):
+            calls.append(prompt)
+            return task_type, 0.8
+        monkeypatch.setattr(classifier, "classify_task_with_embeddings", fake_classify)
+        return calls
+
+    monkeypatch.setattr(classifier, "_log_selection", lambda prompt, task_type, confidence, model, override_reason: model)
+    classifier._SELECTION_CACHE.clear()
+    yield set_task_type
+    classifier._SELECTION_CACHE.clear()
+
+@pytest.mark.parametrize("task_type, expected", [
+    ("coding", "reasoning"),
+    ("general", "coding"),
+    ("reasoning", "coding"),
+])
+def test_coding_and_reasoning_terms_depend_on_classification(classify, task_type, expected):
+    calls = classify(task_type)
+    assert classifier.get_model_for_task("analyze this code") == TASK_MODELS[expected]
+    assert calls == ["analyze this code"]
+
+@pytest.mark.parametrize("task_type, expected", [
+    ("coding", "reasoning"),
+    ("creative", "coding"),
+])
+def test_long_coding_prompt_depends_on_classification(classify, task_type, expected):
+    prompt = "debug " + LONG_PROMPT
+    classify(task_type)
+    assert classifier.get_model_for_task(prompt) == TASK_MODELS[expected]
+
+@pytest.mark.parametrize("prompt, expected", [
+    ("debug this python script", "coding"),
+    ("evaluate the tradeoffs of remote work", "reasoning"),
+    (LONG_PROMPT, "reasoning"),
+], ids=["coding", "reasoning", "long"])
+def test_unambiguous_keywords_skip_classification(classify, prompt, expected):
+    calls = classify("general")
+    assert classifier.get_model_for_task(prompt) == TASK_MODELS[expected]
+    assert calls == []
+
+def test_prompt_without_keywords_uses_classification(classify):
+    calls = classify("creative")
+    assert classifier.get_model_for_task("write me a poem about the sea") == TASK_MODELS["creative"]
+    assert len(calls) == 1
+
+def test_batch_with_mismatched_embeddings_defaults_to_general(monkeypatch):
+    monkeypatch.setattr(classifier, "TASK_MATRIX", np.eye(2, 4, dtype=np.float32))
+    monkeypatch.setattr(classifier, "TASK_ORDER", ["coding", "general"])
+    monkeypatch.setattr(classifier, "get_embeddings_batch", lambda prompts: [
+        np.array([1, 0, 0, 0], dtype=np.float32),
+        np.ones(3, dtype=np.float32)
+    ])
+    results = classifier.classify_tasks_with_embeddings(["write code", "hello"])
+    assert results[0][0] == "coding"
+    assert results[1] == ("general", 0.5)
+
+def test_mismatched_embedding_selection_is_not_cached(classify, monkeypatch):
+    monkeypatch.setattr(
+        classifier, "classify_task_with_embeddings", lambda prompt: classifier.MISMATCHED_EMBEDDING_RESULT
+    )
+    assert classifier.get_model_for_task("write me a poem about the sea") == TASK_MODELS["general"]
+    assert len(classifier._SELECTION_CACHE) == 0
+
+    calls = classify("creative")
+    assert classifier.get_model_for_task("write me a poem about the sea") == TASK_MODELS["creative"]
+    assert len(calls) == 1
+    assert len(classifier._SELECTION_CACHE) == 1
@@ -4,26 +4,28 @@ Test Redis connection with the updated configuration.
 
 import asyncio
 import redis.asyncio as redis
-import os
 
-# Import our Redis configuration override
-import redis_config
+from utils.config import config
+
+# Number of concurrent pings used to exercise the connection pool
+PARALLEL_PINGS = 32
 
 async def test_redis_connection():
     """Test the Redis connection with the updated configuration."""
-    print(f"Testing Redis connection to {os.environ['REDIS_HOST']}:{os.environ['REDIS_PORT']}")
+    print(f"Testing Redis connection to {config.REDIS_HOST}:{config.REDIS_PORT}")
     
-    # Create Redis client with the overridden configuration
+    # Create Redis client with the application configuration
     client = redis.Redis(
-        host=os.environ['REDIS_HOST'],
-        port=int(os.environ['REDIS_PORT']),
-        password=os.environ['REDIS_PASSWORD'],
-        ssl=os.environ['REDIS_SSL'].lower() == 'true',
+        host=config.REDIS_HOST,
+        port=config.REDIS_PORT,
+        password=config.REDIS_PASSWORD,
+        ssl=config.REDIS_SSL,
         decode_responses=True,
         socket_timeout=5.0,
         socket_connect_timeout=5.0,
         retry_on_timeout=True,
-        health_check_interval=30
+        health_check_interval=30,
+        max_connections=PARALLEL_PINGS
     )
     
     try:
@@ -31,20 +33,24 @@ async def test_redis_connection():
         await client.ping()
         print("✅ Successfully connected to Redis!")
         
-        # Test setting and getting a value
-        await client.set("test_key", "test_value")
-        value = await client.get("test_key")
+        # Test setting, getting and cleaning up a value in one round trip
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.set("test_key", "test_value")
+            pipe.get("test_key")
+            pipe.delete("test_key")
+            _, value, deleted = await pipe.execute()
         print(f"✅ Successfully set and retrieved a value: {value}")
+        print(f"✅ Successfully cleaned up test key ({deleted} deleted)")
         
-        # Clean up
-        await client.delete("test_key")
-        print("✅ Successfully cleaned up test key")
+        # Test concurrent commands sharing the connection pool
+        results = await asyncio.gather(*(client.ping() for _ in range(PARALLEL_PINGS)))
+        print(f"✅ Successfully ran {sum(results)} concurrent pings through the connection pool")
         
     except Exception as e:
         print(f"❌ Redis connection failed: {str(e)}")
     finally:
         # Close the connection
-        await client.close()
+        await client.aclose()
         print("Connection closed")
 
 if __name__ == "__main__":
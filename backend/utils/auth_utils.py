@@ -3,6 +3,10 @@ from typing import Optional, List, Dict, Any
 import uuid
 from utils.logger import logger as app_logger
 
+# IDs every request is attributed to in local server mode
+DEFAULT_USER_ID = "00000000-0000-0000-0000-000000000001"
+DEFAULT_ACCOUNT_ID = "00000000-0000-0000-0000-000000000000"
+
 # This function always returns a default user ID without checking JWT
 async def get_current_user_id_from_jwt(request: Request) -> str:
     """
@@ -15,9 +19,8 @@ async def get_current_user_id_from_jwt(request: Request) -> str:
         str: A default user ID for local server mode
     """
     # Return a default user ID for local server mode
-    default_user_id = "00000000-0000-0000-0000-000000000001"
-    app_logger.info(f"Local server mode: Using default user ID: {default_user_id}")
-    return default_user_id
+    app_logger.debug("Local server mode: Using default user ID: %s", DEFAULT_USER_ID)
+    return DEFAULT_USER_ID
 
 async def get_account_id_from_thread(client, thread_id: str) -> str:
     """
@@ -31,9 +34,8 @@ async def get_account_id_from_thread(client, thread_id: str) -> str:
         str: A default account ID for local server mode
     """
     # Return a default account ID for local server mode
-    default_account_id = "00000000-0000-0000-0000-000000000000"
-    app_logger.info(f"Local server mode: Using default account ID: {default_account_id}")
-    return default_account_id
+    app_logger.debug("Local server mode: Using default account ID: %s", DEFAULT_ACCOUNT_ID)
+    return DEFAULT_ACCOUNT_ID
     
 async def get_user_id_from_stream_auth(
     request: Request,
@@ -50,16 +52,15 @@ async def get_user_id_from_stream_auth(
         str: A default user ID for local server mode
     """
     # Return a default user ID for local server mode
-    default_user_id = "00000000-0000-0000-0000-000000000001"
-    app_logger.info(f"Local server mode: Using default user ID for stream: {default_user_id}")
-    return default_user_id
+    app_logger.debug("Local server mode: Using default user ID for stream: %s", DEFAULT_USER_ID)
+    return DEFAULT_USER_ID
 async def verify_thread_access(client, thread_id: str, user_id: str):
     """
     Verify that the user has access to the thread.
     In local server mode, always allow access.
     """
     # Always allow access in local server mode
-    app_logger.info(f"Local server mode: Bypassing authentication for thread access to {thread_id}")
+    app_logger.debug("Local server mode: Bypassing authentication for thread access to %s", thread_id)
     return True
 
 async def get_optional_user_id(request: Request) -> Optional[str]:
@@ -73,6 +74,5 @@ async def get_optional_user_id(request: Request) -> Optional[str]:
         str: A default user ID for local server mode
     """
     # Return a default user ID for local server mode
-    default_user_id = "00000000-0000-0000-0000-000000000001"
-    app_logger.info(f"Local server mode: Using default user ID for optional auth: {default_user_id}")
-    return default_user_id
+    app_logger.debug("Local server mode: Using default user ID for optional auth: %s", DEFAULT_USER_ID)
+    return DEFAULT_USER_ID
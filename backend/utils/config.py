@@ -128,6 +128,12 @@ class Configuration:
     # Ollama configuration
     OLLAMA_API_BASE: Optional[str] = "http://192.168.1.10:11434"
     OLLAMA_PROVIDER: Optional[str] = "ollama"
+    # When a model has no provider prefix and OLLAMA_PROVIDER isn't set, try
+    # ollama/ and openai/ at once instead of retrying with openai/; off by
+    # default since the losing request may still be billed
+    LLM_RACE_PROVIDER_PREFIXES: bool = False
+    # Seconds to reuse responses to identical deterministic LLM calls; 0 disables the cache
+    LLM_RESPONSE_CACHE_TTL: int = 0
     
     # Supabase configuration
     SUPABASE_URL: str
@@ -138,7 +144,7 @@ class Configuration:
     REDIS_HOST: str
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: str
-    REDIS_SSL: bool = True
+    REDIS_SSL: bool = False
     
     # Daytona sandbox configuration
     DAYTONA_API_KEY: str
@@ -12,12 +12,14 @@ import logging
 import json
 import sys
 import os
+import atexit
+import queue
 from datetime import datetime
 from typing import Any, Dict, Optional
 from contextvars import ContextVar
 from functools import wraps
 import traceback
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
 from utils.config import config, EnvMode
 
@@ -55,10 +57,24 @@ class JSONFormatter(logging.Formatter):
             
         return json.dumps(log_data)
 
+class _UnformattedQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the listener thread."""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue stays in this process, so the record can be handed over
+        # with its args unmerged; %-style arguments are then only formatted
+        # on the listener thread, and only for handlers that accept the level
+        return record
+
 def setup_logger(name: str = 'agentpress') -> logging.Logger:
     """
     Set up a centralized logger with both file and console handlers.
     
+    Records are put on a queue and formatted and written to the handlers by
+    a background thread, so logging from request handlers never waits on
+    string formatting or file or console I/O. The queue is drained when the
+    process exits.
+    
     Args:
         name: The name of the logger
         
@@ -67,6 +83,7 @@ def setup_logger(name: str = 'agentpress') -> logging.Logger:
     """
     logger = logging.getLogger(name)
     logger.setLevel(logging.DEBUG)  
+    handlers = []
     
     # Create logs directory if it doesn't exist
     log_dir = os.path.join(os.getcwd(), 'logs')
@@ -96,7 +113,7 @@ def setup_logger(name: str = 'agentpress') -> logging.Logger:
         file_handler.setFormatter(file_formatter)
         
         # Add file handler to logger
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
         print(f"Added file handler for: {log_file}")
     except Exception as e:
         print(f"Error setting up file handler: {e}")
@@ -115,11 +132,19 @@ def setup_logger(name: str = 'agentpress') -> logging.Logger:
         console_handler.setFormatter(console_formatter)
         
         # Add console handler to logger
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
         print(f"Added console handler with level: {console_handler.level}")
     except Exception as e:
         print(f"Error setting up console handler: {e}")
     
+    # Write records on a background thread
+    if handlers:
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        logger.addHandler(_UnformattedQueueHandler(log_queue))
+    
     # # Test logging
     # logger.debug("Logger setup complete - DEBUG test")
     # logger.info("Logger setup complete - INFO test")
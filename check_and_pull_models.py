@@ -4,11 +4,15 @@ Script to check for installed Ollama models and pull required models if they're
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import re
 import time
 import sys
 import os
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set
 
 # Configuration
 OLLAMA_API_BASE = "http://192.168.1.10:11434"  # From your docker-compose.yaml
@@ -29,10 +33,19 @@ MODELS_TO_CHECK = [
     "qwen2.5:32b-instruct-q4_K_M"  # Current default model
 ]
 
+# Number of models pulled at the same time
+MAX_CONCURRENT_PULLS = 4
+
+# Shared session so requests to the Ollama server reuse connections
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=MAX_CONCURRENT_PULLS, pool_maxsize=MAX_CONCURRENT_PULLS * 2)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+
 def get_installed_models() -> List[Dict[str, Any]]:
     """Get a list of all installed models on the Ollama server."""
     try:
-        response = requests.get(f"{OLLAMA_API_BASE}/api/tags")
+        response = _session.get(f"{OLLAMA_API_BASE}/api/tags")
         if response.status_code == 200:
             return response.json().get("models", [])
         else:
@@ -42,22 +55,22 @@ def get_installed_models() -> List[Dict[str, Any]]:
         print(f"Exception when fetching models: {e}")
         return []
 
-def is_model_installed(model_name: str, installed_models: List[Dict[str, Any]]) -> bool:
-    """Check if a specific model is installed."""
-    return any(model.get("name") == model_name for model in installed_models)
+def is_model_installed(model_name: str, installed_names: Set[str]) -> bool:
+    """Check if a specific model is installed, given the names of the installed models."""
+    return model_name in installed_names
 
 def pull_model(model_name: str) -> bool:
     """Pull a model from Ollama."""
     print(f"Pulling model: {model_name}...")
     try:
-        response = requests.post(
+        response = _session.post(
             f"{OLLAMA_API_BASE}/api/pull",
             json={"name": model_name},
             stream=True
         )
         
         if response.status_code != 200:
-            print(f"Error starting model pull: {response.status_code} - {response.text}")
+            print(f"[{model_name}] Error starting model pull: {response.status_code} - {response.text}")
             return False
         
         # Process the streaming response to show progress
@@ -68,19 +81,19 @@ def pull_model(model_name: str) -> bool:
                     if "status" in progress_data:
                         status = progress_data.get("status")
                         if "completed" in progress_data and progress_data.get("completed"):
-                            print(f"Status: {status} - Completed!")
+                            print(f"[{model_name}] Status: {status} - Completed!")
                         elif "total" in progress_data and "completed" in progress_data:
                             total = progress_data.get("total", 0)
                             completed = progress_data.get("completed", 0)
                             if total > 0:
                                 percentage = (completed / total) * 100
-                                print(f"Status: {status} - {percentage:.2f}% ({completed}/{total})")
+                                print(f"[{model_name}] Status: {status} - {percentage:.2f}% ({completed}/{total})")
                             else:
-                                print(f"Status: {status}")
+                                print(f"[{model_name}] Status: {status}")
                         else:
-                            print(f"Status: {status}")
+                            print(f"[{model_name}] Status: {status}")
                 except json.JSONDecodeError:
-                    print(f"Could not parse progress data: {line}")
+                    print(f"[{model_name}] Could not parse progress data: {line}")
         
         print(f"Successfully pulled model: {model_name}")
         return True
@@ -88,34 +101,30 @@ def pull_model(model_name: str) -> bool:
         print(f"Exception when pulling model {model_name}: {e}")
         return False
 
+# The TASK_MODELS dictionary literal in the classifier modules
+TASK_MODELS_RE = re.compile(r"TASK_MODELS\s*=\s*\{[^}]*\}")
+
 def update_task_classifier(models_to_use: Dict[str, str]) -> None:
     """Update the task classifier with the models we've installed."""
-    task_classifier_path = "/Volumes/appdata/suna/backend/services/task_classifier.py"
-    embedding_classifier_path = "/Volumes/appdata/suna/backend/services/embedding_task_classifier.py"
+    task_classifier_path = Path("/Volumes/appdata/suna/backend/services/task_classifier.py")
+    embedding_classifier_path = Path("/Volumes/appdata/suna/backend/services/embedding_task_classifier.py")
+    
+    # Create the new dictionary content
+    new_dict_content = "TASK_MODELS = {\n" + "".join(
+        f'    "{task}": "{model}",\n' for task, model in models_to_use.items()
+    ) + "}"
     
     for file_path in [task_classifier_path, embedding_classifier_path]:
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                content = f.read()
+        if file_path.exists():
+            content = file_path.read_text()
             
-            # Find the TASK_MODELS dictionary
-            start_idx = content.find("TASK_MODELS = {")
-            if start_idx != -1:
-                end_idx = content.find("}", start_idx)
-                if end_idx != -1:
-                    # Create the new dictionary content
-                    new_dict_content = "TASK_MODELS = {\n"
-                    for task, model in models_to_use.items():
-                        new_dict_content += f'    "{task}": "{model}",\n'
-                    new_dict_content += "}"
-                    
-                    # Replace the old dictionary with the new one
-                    new_content = content[:start_idx] + new_dict_content + content[end_idx+1:]
-                    
-                    with open(file_path, 'w') as f:
-                        f.write(new_content)
-                    
-                    print(f"Updated {file_path} with new model mappings")
+            # Replace the old dictionary with the new one
+            new_content, replaced = TASK_MODELS_RE.subn(lambda _: new_dict_content, content, count=1)
+            
+            # Leave the file untouched if there is nothing to change
+            if replaced and new_content != content:
+                file_path.write_text(new_content)
+                print(f"Updated {file_path} with new model mappings")
 
 def main():
     """Main function to check and pull models."""
@@ -130,10 +139,13 @@ def main():
     for model in installed_models:
         print(f"- {model.get('name')} ({model.get('size', 'unknown size')})")
     
+    # Model names to check required models against
+    installed_names = {model.get("name") for model in installed_models}
+    
     print("\nChecking for required models...")
     models_to_pull = []
     for model_name in MODELS_TO_CHECK:
-        if is_model_installed(model_name, installed_models):
+        if is_model_installed(model_name, installed_names):
             print(f"✓ {model_name} is already installed")
         else:
             print(f"✗ {model_name} is not installed")
@@ -147,10 +159,13 @@ def main():
             print(f"- {model_name}")
         
         print("\nStarting model pulls...")
-        for model_name in models_to_pull:
-            success = pull_model(model_name)
-            if not success:
-                print(f"Failed to pull {model_name}")
+        # Pull several models at once, so the total time is closer to the
+        # slowest pull than to the sum of all of them
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PULLS) as executor:
+            results = executor.map(pull_model, models_to_pull)
+            for model_name, success in zip(models_to_pull, results):
+                if not success:
+                    print(f"Failed to pull {model_name}")
     
     # Determine which models to use based on what's installed
     models_to_use = {
@@ -161,25 +176,25 @@ def main():
     }
     
     # Check for coding models
-    if is_model_installed("qwen3:14b-instruct-q4_K_M", installed_models):
+    if is_model_installed("qwen3:14b-instruct-q4_K_M", installed_names):
         models_to_use["coding"] = "qwen3:14b-instruct-q4_K_M"
-    elif is_model_installed("qwen2.5-coder:32b-instruct-q8_0", installed_models):
+    elif is_model_installed("qwen2.5-coder:32b-instruct-q8_0", installed_names):
         models_to_use["coding"] = "qwen2.5-coder:32b-instruct-q8_0"
     
     # Check for reasoning models
-    if is_model_installed("mixtral:8x22b-instruct-v0.1-q4_K_M", installed_models):
+    if is_model_installed("mixtral:8x22b-instruct-v0.1-q4_K_M", installed_names):
         models_to_use["reasoning"] = "mixtral:8x22b-instruct-v0.1-q4_K_M"
     
     # Check for creative models
-    if is_model_installed("qwen3:8b-instruct-q4_K_M", installed_models):
+    if is_model_installed("qwen3:8b-instruct-q4_K_M", installed_names):
         models_to_use["creative"] = "qwen3:8b-instruct-q4_K_M"
-    elif is_model_installed("llama3:8b", installed_models):
+    elif is_model_installed("llama3:8b", installed_names):
         models_to_use["creative"] = "llama3:8b"
     
     # Check for general chat models
-    if is_model_installed("qwen3:32b-instruct-q4_K_M", installed_models):
+    if is_model_installed("qwen3:32b-instruct-q4_K_M", installed_names):
         models_to_use["general"] = "qwen3:32b-instruct-q4_K_M"
-    elif is_model_installed("qwen2.5:32b-instruct-q4_K_M", installed_models):
+    elif is_model_installed("qwen2.5:32b-instruct-q4_K_M", installed_names):
         models_to_use["general"] = "qwen2.5:32b-instruct-q4_K_M"
     
     # Fill in any missing models with defaults
@@ -187,7 +202,7 @@ def main():
         if model is None:
             # Find any installed model to use as fallback
             for check_model in MODELS_TO_CHECK:
-                if is_model_installed(check_model, installed_models):
+                if is_model_installed(check_model, installed_names):
                     models_to_use[task] = check_model
                     break
     
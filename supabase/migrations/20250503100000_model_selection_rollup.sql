@@ -0,0 +1,22 @@
+-- Model Selection Rollup Function
+-- Aggregates model selection logs in the database so the stats endpoint
+-- only transfers one row per group instead of every log entry
+
+CREATE OR REPLACE FUNCTION public.get_selection_rollup(p_days INTEGER)
+RETURNS TABLE (
+    task_type TEXT,
+    selected_model TEXT,
+    override_applied BOOLEAN,
+    selections BIGINT,
+    confidence_sum DOUBLE PRECISION
+) AS $$
+    SELECT
+        l.task_type,
+        l.selected_model,
+        l.override_reason IS NOT NULL AND l.override_reason <> '' AS override_applied,
+        COUNT(*) AS selections,
+        SUM(l.confidence) AS confidence_sum
+    FROM public.model_selection_logs l
+    WHERE l.created_at >= NOW() - make_interval(days => p_days)
+    GROUP BY 1, 2, 3;
+$$ LANGUAGE sql STABLE;
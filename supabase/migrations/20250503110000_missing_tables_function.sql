@@ -0,0 +1,13 @@
+-- Missing Tables Function
+-- Lets setup scripts check for all required tables in one round trip
+
+CREATE OR REPLACE FUNCTION public.get_missing_tables(p_tables TEXT[])
+RETURNS TABLE (table_name TEXT) AS $$
+    SELECT required.name
+    FROM unnest(p_tables) AS required(name)
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM information_schema.tables t
+        WHERE t.table_schema = 'public' AND t.table_name = required.name
+    );
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,25 @@
+-- Agent Action Logs Keyset Indexes
+-- Composite indexes matching get_agent_action_logs: an equality filter plus
+-- newest-first ordering on (created_at, id), so pages are read by index seek.
+-- CONCURRENTLY is not used because migrations run inside a transaction.
+
+CREATE INDEX IF NOT EXISTS agent_action_logs_thread_ts_idx
+    ON public.agent_action_logs(thread_id, created_at DESC, id DESC)
+    WHERE thread_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS agent_action_logs_agent_run_ts_idx
+    ON public.agent_action_logs(agent_run_id, created_at DESC, id DESC)
+    WHERE agent_run_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS agent_action_logs_project_ts_idx
+    ON public.agent_action_logs(project_id, created_at DESC, id DESC)
+    WHERE project_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS agent_action_logs_action_type_ts_idx
+    ON public.agent_action_logs(action_type, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS agent_action_logs_ts_idx
+    ON public.agent_action_logs(created_at DESC, id DESC);
+
+-- The single-column indexes are covered by the composite indexes above
+DROP INDEX IF EXISTS public.agent_action_logs_thread_id_idx;
+DROP INDEX IF EXISTS public.agent_action_logs_agent_run_id_idx;
+DROP INDEX IF EXISTS public.agent_action_logs_project_id_idx;
+DROP INDEX IF EXISTS public.agent_action_logs_action_type_idx;
+DROP INDEX IF EXISTS public.agent_action_logs_created_at_idx;
@@ -0,0 +1,16 @@
+-- Bulk Insert Function for Agent Action Logs
+-- Inserts a JSON array of log rows in one statement, used to drain large
+-- backlogs of queued logs without hitting PostgREST request-size limits per row
+
+CREATE OR REPLACE FUNCTION public.bulk_insert_agent_logs(payload JSONB)
+RETURNS VOID AS $$
+    INSERT INTO public.agent_action_logs (thread_id, agent_run_id, project_id, action_type, action_details)
+    SELECT x.thread_id, x.agent_run_id, x.project_id, x.action_type, x.action_details
+    FROM jsonb_to_recordset(payload) AS x(
+        thread_id UUID,
+        agent_run_id UUID,
+        project_id UUID,
+        action_type TEXT,
+        action_details JSONB
+    );
+$$ LANGUAGE sql;
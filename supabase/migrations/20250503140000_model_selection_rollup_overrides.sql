@@ -0,0 +1,24 @@
+-- Model Selection Rollup Overrides
+-- Counts overrides within each (task type, model) group instead of grouping
+-- on whether an override was applied, halving the rows returned at most
+
+DROP FUNCTION IF EXISTS public.get_selection_rollup(INTEGER);
+
+CREATE FUNCTION public.get_selection_rollup(p_days INTEGER)
+RETURNS TABLE (
+    task_type TEXT,
+    selected_model TEXT,
+    selections BIGINT,
+    confidence_sum DOUBLE PRECISION,
+    override_count BIGINT
+) AS $$
+    SELECT
+        l.task_type,
+        l.selected_model,
+        COUNT(*) AS selections,
+        SUM(l.confidence) AS confidence_sum,
+        COUNT(*) FILTER (WHERE l.override_reason IS NOT NULL AND l.override_reason <> '') AS override_count
+    FROM public.model_selection_logs l
+    WHERE l.created_at >= NOW() - make_interval(days => p_days)
+    GROUP BY 1, 2;
+$$ LANGUAGE sql STABLE;